@@ -1,20 +1,154 @@
+import itertools
+import re
 import sqlite3
+import threading
+import time
+
+from db_pool import get_pool
+
+_READS = re.compile(r"\s*(?:SELECT|WITH|VALUES|EXPLAIN)\b", re.IGNORECASE)
+_WRITES = re.compile(r"\b(?:INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b",
+                     re.IGNORECASE)
+
+def is_read(sql):
+    """True for statements that only read (safe to send to a replica)."""
+    return bool(_READS.match(sql)) and not _WRITES.search(sql)
 
 class DatabaseConnection:
+    """Borrows a connection to db_name from the shared pool for the block."""
     def __init__(self, db_name):
         self.db_name = db_name
         self.conn = None
 
     def __enter__(self):
-        self.conn = sqlite3.connect(self.db_name)
+        self.conn = get_pool(self.db_name).acquire()
+        return self.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.conn:
+            get_pool(self.db_name).release(self.conn)
+            self.conn = None
+
+def make_replicas(primary, paths):
+    """Copy primary into each of paths (local stand-ins for replicas)."""
+    source = sqlite3.connect(primary)
+    try:
+        for path in paths:
+            target = sqlite3.connect(path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+    finally:
+        source.close()
+    return list(paths)
+
+class ReplicaRouter:
+    """
+    Where the statements for one primary database go: writes to primary,
+    reads round-robin across read-only replicas. Without replicas, reads
+    use the primary opened with mode=ro. Keeps per-target latency stats.
+    """
+    def __init__(self, primary, replicas=None):
+        self.primary = primary
+        self.replicas = list(replicas) if replicas else [primary]
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def pool(self, target, read_only):
+        return get_pool(target, read_only=read_only)
+
+    def next_replica(self):
+        return self.replicas[next(self._next) % len(self.replicas)]
+
+    def sync(self):
+        """Refresh replica copies from the primary (no-op for mode=ro)."""
+        copies = [r for r in self.replicas if r != self.primary]
+        if copies:
+            make_replicas(self.primary, copies)
+
+    def record(self, target, elapsed, error=False):
+        with self._lock:
+            stats = self._stats.setdefault(target, {
+                "queries": 0, "errors": 0, "total": 0.0, "max": 0.0})
+            stats["queries"] += 1
+            stats["errors"] += error
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+
+    def stats(self):
+        """Per-target queries, errors and total/mean/max seconds."""
+        with self._lock:
+            return {target: dict(stats, mean=stats["total"] / stats["queries"])
+                    for target, stats in self._stats.items()}
+
+class RoutedDatabaseConnection:
+    """
+    DatabaseConnection for a ReplicaRouter, used as a session:
+    execute() sends reads to the next replica and writes to the primary,
+    returning the fetched rows. Once the session writes it keeps the
+    primary connection and reads from it too, so it sees its own writes;
+    they are committed when the block exits cleanly.
+    """
+    def __init__(self, router):
+        self.router = router
+        self.conn = None  # primary connection, after the first write
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def _run(self, target, conn, method, sql, params):
+        start = time.perf_counter()
+        try:
+            cursor = getattr(conn, method)(sql, params)
+            rows = cursor.fetchall()
+        except sqlite3.Error:
+            self.router.record(target, time.perf_counter() - start, True)
+            raise
+        self.router.record(target, time.perf_counter() - start)
+        self.rowcount = cursor.rowcount
+        return rows
+
+    def _primary(self):
+        if self.conn is None:
+            self.conn = self.router.pool(self.router.primary, False).acquire()
         return self.conn
 
+    def execute(self, sql, params=()):
+        if self.conn is None and is_read(sql):
+            target = self.router.next_replica()
+            with self.router.pool(target, True).connection() as conn:
+                return self._run(target, conn, "execute", sql, params)
+        return self._run(self.router.primary, self._primary(), "execute",
+                         sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._run(self.router.primary, self._primary(), "executemany",
+                         sql, seq_of_params)
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.conn:
-            self.conn.close()
+            if exc_type is None and self.conn.in_transaction:
+                self.conn.commit()
+            self.router.pool(self.router.primary, False).release(self.conn)
+            self.conn = None
+
+if __name__ == "__main__":
+    # Assume users.db exists with users table
+    with DatabaseConnection('users.db') as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM users")
+        print(cursor.fetchall())
 
-# Assume users.db exists with users table
-with DatabaseConnection('users.db') as conn:
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users")
-    print(cursor.fetchall())
\ No newline at end of file
+    router = ReplicaRouter('users.db', make_replicas(
+        'users.db', ['users_replica1.db', 'users_replica2.db']))
+    with RoutedDatabaseConnection(router) as db:
+        print(db.execute("SELECT * FROM users WHERE age > ?", (40,)))
+        print(db.execute("SELECT COUNT(*) FROM users"))
+        db.execute("UPDATE users SET age = age WHERE id = ?", (1,))
+        print(db.execute("SELECT * FROM users WHERE id = ?", (1,)))
+    for target, stats in router.stats().items():
+        print(f"{target}: {stats['queries']} queries, "
+              f"{stats['mean'] * 1000:.3f} ms mean")
\ No newline at end of file
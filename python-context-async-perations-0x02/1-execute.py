@@ -1,28 +1,93 @@
-import sqlite3
+import time
+import warnings
+from collections.abc import Mapping
+
+from db_pool import FETCH_CHUNK, get_pool, iter_rows
 
 class ExecuteQuery:
-    def __init__(self, query, param=None):
+    """
+    Context manager running one query on a pooled connection.
+    - params: a sequence (or mapping, for :name placeholders) of values;
+      a lone scalar such as 25 or 0 is bound as the only parameter;
+      the old param= keyword still works but is deprecated
+    - entering returns the rows as a list, or with lazy=True a generator
+      fetching arraysize rows at a time, valid until the block exits
+    - many=True runs executemany over params (a sequence of parameter
+      sets) and returns the affected row count
+    Writes are committed when the block exits cleanly and rolled back on
+    error. The instance can be entered again; execution times (seconds,
+    including fetching for materialized results) are kept in
+    self.timings, the last one also in self.elapsed.
+    """
+
+    def __init__(self, query, params=None, *, many=False, lazy=False,
+                 arraysize=FETCH_CHUNK, database='users.db', param=None):
+        if param is not None:
+            if params is not None:
+                raise TypeError("pass params or param, not both")
+            warnings.warn("ExecuteQuery(param=...) is deprecated, use "
+                          "params=...", DeprecationWarning, stacklevel=2)
+            params = param
         self.query = query
-        self.param = param
+        self.params = params
+        self.many = many
+        self.lazy = lazy
+        self.arraysize = arraysize
+        self.database = database
         self.conn = None
-        self.cursor = None
+        self.rows = None
+        self.elapsed = None
+        self.timings = []
+
+    def _bound_params(self):
+        params = self.params
+        if params is None:
+            return ()
+        if self.many:
+            return [p if isinstance(p, (Mapping, list, tuple)) else (p,)
+                    for p in params]
+        if isinstance(params, (Mapping, list, tuple)):
+            return params
+        return (params,)
 
     def __enter__(self):
-        self.conn = sqlite3.connect('users.db')
-        self.cursor = self.conn.cursor()
-        if self.param:
-            self.cursor.execute(self.query, (self.param,))
-        else:
-            self.cursor.execute(self.query)
-        return self.cursor.fetchall()
+        pool = get_pool(self.database)
+        self.conn = pool.acquire()
+        try:
+            params = self._bound_params()
+            start = time.perf_counter()
+            if self.many:
+                result = self.conn.executemany(self.query, params).rowcount
+            elif self.lazy:
+                result = self.rows = iter_rows(
+                    self.conn.execute(self.query, params), self.arraysize)
+            else:
+                result = self.conn.execute(self.query, params).fetchall()
+            self.elapsed = time.perf_counter() - start
+            self.timings.append(self.elapsed)
+        except BaseException:
+            pool.release(self.conn)
+            self.conn = None
+            raise
+        return result
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+        if self.rows is not None:
+            self.rows.close()
+            self.rows = None
+        if self.conn is not None:
+            if exc_type is None and self.conn.in_transaction:
+                self.conn.commit()
+            get_pool(self.database).release(self.conn)
+            self.conn = None
 
-# Usage
-result = ExecuteQuery("SELECT * FROM users WHERE age > ?", 25)
-print(result.__enter__())
-result.__exit__(None, None, None)
\ No newline at end of file
+if __name__ == "__main__":
+    # Usage
+    with ExecuteQuery("SELECT * FROM users WHERE age > ?", 25) as result:
+        print(result)
+    query = ExecuteQuery("SELECT * FROM users WHERE age > :age",
+                         {"age": 0}, lazy=True)
+    with query as rows:
+        for row in rows:
+            print(row)
+    print(f"{query.elapsed * 1000:.2f} ms")
\ No newline at end of file
@@ -1,23 +1,107 @@
 import asyncio
-import aiosqlite
+import contextlib
 
-async def async_fetch_users():
-    async with aiosqlite.connect('users.db') as db:
+from async_pool import close_async_pools, gather_limited, get_async_pool
+from batch_loader import BatchLoader
+from db_pool import MAX_IN_LIST, in_list_chunks
+
+# Cap on queries (and so connections and threads) in flight at once
+MAX_CONCURRENCY = 8
+
+# Rows fetched per round trip to the connection's thread when streaming
+ARRAYSIZE = 500
+
+async def async_fetch_users(pool=None):
+    pool = pool or get_async_pool('users.db', read_only=True)
+    async with pool.acquire() as db:
         async with db.execute("SELECT * FROM users") as cursor:
             return await cursor.fetchall()
 
-async def async_fetch_older_users():
-    async with aiosqlite.connect('users.db') as db:
+async def async_fetch_older_users(pool=None):
+    pool = pool or get_async_pool('users.db', read_only=True)
+    async with pool.acquire() as db:
         async with db.execute("SELECT * FROM users WHERE age > 40") as cursor:
             return await cursor.fetchall()
 
+async def async_stream_user_batches(query="SELECT * FROM users", params=(),
+                                    arraysize=ARRAYSIZE, pool=None):
+    """
+    Async generator over lists of up to arraysize rows of query, holding a
+    pooled connection until exhausted or closed. Close it promptly when
+    stopping early (async with contextlib.aclosing(...)); cancellation
+    closes the cursor as well.
+    """
+    pool = pool or get_async_pool('users.db', read_only=True)
+    async with pool.acquire() as db:
+        cursor = await db.execute(query, params)
+        try:
+            cursor.arraysize = arraysize
+            while True:
+                rows = await cursor.fetchmany()
+                if not rows:
+                    return
+                yield rows
+        finally:
+            await cursor.close()
+
+async def async_stream_users(query="SELECT * FROM users", params=(),
+                             arraysize=ARRAYSIZE, pool=None):
+    """async_fetch_users as an async generator over single rows."""
+    async with contextlib.aclosing(async_stream_user_batches(
+            query, params, arraysize, pool)) as batches:
+        async for rows in batches:
+            for row in rows:
+                yield row
+
+async def async_fetch_users_by_ids(user_ids, pool=None):
+    """
+    Rows for user_ids, in order (None if missing), one query per
+    MAX_IN_LIST ids.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+    pool = pool or get_async_pool('users.db', read_only=True)
+    found = {}
+    async with pool.acquire() as db:
+        for placeholders, chunk in in_list_chunks(user_ids):
+            async with db.execute(
+                    f"SELECT * FROM users WHERE id IN ({placeholders})",
+                    chunk) as cursor:
+                found.update((row[0], row) for row in await cursor.fetchall())
+    return [found.get(user_id) for user_id in user_ids]
+
+def user_loader(pool=None):
+    """Per-request BatchLoader merging user-by-id lookups into IN queries."""
+    return BatchLoader(lambda ids: async_fetch_users_by_ids(ids, pool),
+                       max_batch=MAX_IN_LIST)
+
+async def async_fetch_user_by_id(user_id, loader=None, pool=None):
+    """One user by id; batched with concurrent lookups through loader."""
+    if loader is not None:
+        return await loader.load(user_id)
+    return (await async_fetch_users_by_ids([user_id], pool))[0]
+
 async def fetch_concurrently():
-    users, older_users = await asyncio.gather(
+    users, older_users = await gather_limited(
         async_fetch_users(),
-        async_fetch_older_users()
+        async_fetch_older_users(),
+        limit=MAX_CONCURRENCY
     )
     print("All users:", users)
     print("Older users:", older_users)
+    loader = user_loader()
+    print("Users 1-3:", await asyncio.gather(
+        *(async_fetch_user_by_id(user_id, loader) for user_id in (1, 2, 3))))
+    async with contextlib.aclosing(async_stream_users(arraysize=2)) as rows:
+        async for row in rows:
+            print("Streamed:", row)
+
+async def main():
+    try:
+        await fetch_concurrently()
+    finally:
+        await close_async_pools()
 
 if __name__ == "__main__":
-    asyncio.run(fetch_concurrently())
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
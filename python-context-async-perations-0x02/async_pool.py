@@ -0,0 +1,215 @@
+import asyncio
+import contextlib
+import time
+import weakref
+from collections import deque
+
+import aiosqlite
+
+from db_pool import (CACHED_STATEMENTS, DEFAULT_PROFILE, profile_pragmas,
+                     read_only_uri)
+
+# Handed to a waiter when a slot frees up without a connection to pass on
+_CREATE = object()
+
+
+class AsyncConnectionPool:
+    """
+    asyncio pool of aiosqlite connections to one database file. aiosqlite
+    runs a thread per connection, so max_size also caps the threads used.
+    - async with pool.acquire() as conn: ... waits up to timeout seconds
+      when all max_size connections are busy, then raises TimeoutError
+    - waiters are served first come, first served
+    - connections get the db_pool profile; read_only pools open the file
+      with mode=ro
+    - stats() reports acquisitions, creations and wait-time metrics
+    Use it from one event loop only.
+    """
+
+    def __init__(self, database, max_size=8, timeout=5.0,
+                 cached_statements=CACHED_STATEMENTS,
+                 profile=DEFAULT_PROFILE, read_only=False):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.profile = profile
+        self.read_only = read_only
+        self._idle = []          # most recently released last
+        self._waiters = deque()  # futures of tasks waiting for a connection
+        self._size = 0
+        self._closed = False
+        self.acquired = 0
+        self.created = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    async def _create(self):
+        kwargs = {"cached_statements": self.cached_statements}
+        database = self.database
+        if self.read_only:
+            database, kwargs["uri"] = read_only_uri(database), True
+        conn = await aiosqlite.connect(database, **kwargs)
+        try:
+            for statement in profile_pragmas(self.profile, self.read_only):
+                await (await conn.execute(statement)).close()
+        except BaseException:
+            await conn.close()
+            raise
+        self.created += 1
+        return conn
+
+    async def _wait(self, start):
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        remaining = self.timeout - (time.monotonic() - start)
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), remaining)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a connection just as we gave up: pass it on
+                entry = waiter.result()
+                if entry is _CREATE:
+                    self._discard()
+                else:
+                    self._hand_over(entry)
+            elif waiter in self._waiters:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            raise
+
+    async def _checkout(self):
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        start = time.monotonic()
+        waited = False
+        if self._idle:
+            entry = self._idle.pop()
+        elif self._size < self.max_size:
+            self._size += 1
+            entry = _CREATE
+        else:
+            waited = True
+            try:
+                entry = await self._wait(start)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"No connection to {self.database} "
+                                   f"available after {self.timeout}s")
+        if entry is _CREATE:
+            try:
+                entry = await self._create()
+            except BaseException:
+                self._discard()
+                raise
+        elapsed = time.monotonic() - start
+        self.acquired += 1
+        if waited:
+            self.waits += 1
+            self.wait_time += elapsed
+            self.max_wait = max(self.max_wait, elapsed)
+        return entry
+
+    def _hand_over(self, entry):
+        """Give a connection (or _CREATE) to the next waiter, if any."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(entry)
+                return True
+        return False
+
+    def _discard(self):
+        """Give up a slot, letting the next waiter open a connection."""
+        if self._closed or not self._hand_over(_CREATE):
+            self._size -= 1
+
+    async def release(self, conn):
+        """Return a connection; an open transaction is rolled back."""
+        if conn.in_transaction:
+            await conn.rollback()
+        if self._closed:
+            self._size -= 1
+            await conn.close()
+        elif not self._hand_over(conn):
+            self._idle.append(conn)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        """Async context manager that acquires and releases a connection."""
+        conn = await self._checkout()
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    async def close(self):
+        """Close idle connections; busy ones are closed when released."""
+        self._closed = True
+        idle, self._idle = self._idle, []
+        self._size -= len(idle)
+        while self._waiters:
+            self._waiters.popleft().cancel()
+        for conn in idle:
+            await conn.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def stats(self):
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "waiting": len(self._waiters),
+            "acquired": self.acquired,
+            "created": self.created,
+            "waits": self.waits,
+            "wait_time": self.wait_time,
+            "avg_wait": self.wait_time / self.waits if self.waits else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+# Pools are bound to the event loop that uses them: loop -> {key: pool}
+_pools = weakref.WeakKeyDictionary()
+
+
+def get_async_pool(database, read_only=False, **kwargs):
+    """
+    Pool for database in the running event loop (one for writers, one for
+    read_only readers), created on first use with kwargs.
+    """
+    pools = _pools.setdefault(asyncio.get_running_loop(), {})
+    key = (database, read_only)
+    pool = pools.get(key)
+    if pool is None:
+        pool = pools[key] = AsyncConnectionPool(database, read_only=read_only,
+                                                **kwargs)
+    return pool
+
+
+async def close_async_pools():
+    """Close the running loop's pools (their threads keep a process alive)."""
+    pools = _pools.pop(asyncio.get_running_loop(), {})
+    for pool in pools.values():
+        await pool.close()
+
+
+async def gather_limited(*aws, limit=8, return_exceptions=False):
+    """
+    asyncio.gather that runs at most limit of the awaitables at a time.
+    Pass coroutines (not tasks), so the rest wait without starting.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws),
+                                return_exceptions=return_exceptions)
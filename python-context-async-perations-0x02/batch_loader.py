@@ -0,0 +1,82 @@
+import asyncio
+
+
+class BatchLoader:
+    """
+    DataLoader-style batching of per-key async lookups.
+    - load(key) calls made in the same event-loop tick are collected and
+      resolved by one `await batch_fn(keys)`, which must return one value
+      per key, in order; batches hold at most max_batch keys
+    - results (and in-flight loads) are memoized per key, so each key is
+      fetched once; create one loader per request, or clear() it
+    - a failed batch fails each of its loads and is not memoized
+    """
+
+    def __init__(self, batch_fn, max_batch=512, cache=True):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.cache = cache
+        self._futures = {}   # key -> future of its (pending) value
+        self._queue = []     # (key, future) waiting for the next dispatch
+        self._tasks = set()  # running batches, referenced until done
+        self.batches = 0
+        self.keys = 0
+
+    async def load(self, key):
+        """Value for key, fetched in a batch with this tick's other loads."""
+        future = self._futures.get(key) if self.cache else None
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            if self.cache:
+                self._futures[key] = future
+            if not self._queue:
+                loop.call_soon(self._dispatch)
+            self._queue.append((key, future))
+        # Shielded: one caller being cancelled must not cancel the others
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys):
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    def prime(self, key, value):
+        """Memoize a value fetched some other way."""
+        if self.cache and key not in self._futures:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+            self._futures[key] = future
+
+    def clear(self, key=None):
+        """Forget key (or every key) so the next load fetches it again."""
+        if key is None:
+            self._futures.clear()
+        else:
+            self._futures.pop(key, None)
+
+    def _dispatch(self):
+        queue, self._queue = self._queue, []
+        for start in range(0, len(queue), self.max_batch):
+            task = asyncio.ensure_future(
+                self._run(queue[start:start + self.max_batch]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        keys = [key for key, _ in batch]
+        self.batches += 1
+        self.keys += len(keys)
+        try:
+            values = await self.batch_fn(keys)
+            if len(values) != len(keys):
+                raise ValueError(f"batch_fn returned {len(values)} values "
+                                 f"for {len(keys)} keys")
+        except Exception as e:
+            for key, future in batch:
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), value in zip(batch, values):
+            if not future.done():
+                future.set_result(value)
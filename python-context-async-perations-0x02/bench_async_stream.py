@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+bench_async_stream.py
+- async_fetch_users-style fetchall against async_stream_users and
+  async_stream_user_batches, for growing tables: time to first row,
+  total time and tracemalloc peak. Streaming should keep the first two
+  columns flat. Uses a throwaway users database per size.
+Usage: ./bench_async_stream.py [arraysize]
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from async_pool import AsyncConnectionPool
+
+concurrent = __import__('3-concurrent')
+
+SIZES = (10000, 100000, 400000)
+
+
+def make_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+                 "age INTEGER)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                     ((i, f"user{i}", i % 90) for i in range(1, rows + 1)))
+    conn.commit()
+    conn.close()
+
+
+async def fetchall(pool, arraysize):
+    async with pool.acquire() as db:
+        async with db.execute("SELECT * FROM users") as cursor:
+            for row in await cursor.fetchall():
+                yield row
+
+
+async def stream_rows(pool, arraysize):
+    async for row in concurrent.async_stream_users(arraysize=arraysize,
+                                                   pool=pool):
+        yield row
+
+
+async def stream_batches(pool, arraysize):
+    async for rows in concurrent.async_stream_user_batches(
+            arraysize=arraysize, pool=pool):
+        for row in rows:
+            yield row
+
+
+async def measure(mode, pool, arraysize):
+    """(seconds to first row, total seconds, peak MiB) of one full read."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    async for _ in mode(pool, arraysize):
+        if first is None:
+            first = time.perf_counter() - start
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, peak / (1024 * 1024)
+
+
+async def run(path, arraysize):
+    async with AsyncConnectionPool(path, read_only=True) as pool:
+        async with pool.acquire():
+            pass  # open the connection up front so no mode pays for it
+        return [(name,) + await measure(mode, pool, arraysize)
+                for name, mode in (("fetchall", fetchall),
+                                   ("stream rows", stream_rows),
+                                   ("stream batches", stream_batches))]
+
+
+def main(arraysize=concurrent.ARRAYSIZE):
+    print(f"arraysize={arraysize}")
+    print(f"{'rows':>8} {'mode':>15} {'first row ms':>13} {'total s':>8} "
+          f"{'peak MiB':>9}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "users.db")
+            make_db(path, size)
+            for name, first, total, peak in asyncio.run(run(path, arraysize)):
+                print(f"{size:>8} {name:>15} {first * 1000:>13.2f} "
+                      f"{total:>8.2f} {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
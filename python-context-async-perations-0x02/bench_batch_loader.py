@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+bench_batch_loader.py
+- Concurrent user-by-id lookups: one query per lookup through the async
+  pool (at most MAX_CONCURRENCY in flight), against a BatchLoader that
+  merges each event-loop tick's lookups into IN (...) queries. Ids are
+  drawn at random, so some repeat and hit the loader's per-request cache.
+  Uses a throwaway users database.
+Usage: ./bench_batch_loader.py [lookups]
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from async_pool import AsyncConnectionPool, gather_limited
+
+concurrent = __import__('3-concurrent')
+
+
+def make_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+                 "age INTEGER)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                     [(i, f"user{i}", i % 90) for i in range(1, rows + 1)])
+    conn.commit()
+    conn.close()
+
+
+async def run(path, ids):
+    async with AsyncConnectionPool(path, read_only=True) as pool:
+        start = time.perf_counter()
+        naive = await gather_limited(
+            *(concurrent.async_fetch_user_by_id(i, pool=pool) for i in ids),
+            limit=concurrent.MAX_CONCURRENCY)
+        naive_time = time.perf_counter() - start
+
+        loader = concurrent.user_loader(pool)
+        start = time.perf_counter()
+        batched = await asyncio.gather(
+            *(concurrent.async_fetch_user_by_id(i, loader) for i in ids))
+        batched_time = time.perf_counter() - start
+    assert batched == naive
+    return naive_time, batched_time, loader
+
+
+def main(lookups=10000):
+    ids = [random.randint(1, lookups) for _ in range(lookups)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.db")
+        make_db(path, lookups)
+        naive, batched, loader = asyncio.run(run(path, ids))
+    print(f"lookups={lookups} distinct ids={len(set(ids))}")
+    print(f"{'mode':>12} {'queries':>8} {'seconds':>8} {'lookups/sec':>12}")
+    print(f"{'per lookup':>12} {lookups:>8} {naive:>8.2f} "
+          f"{lookups / naive:>12,.0f}")
+    print(f"{'batched':>12} {loader.batches:>8} {batched:>8.2f} "
+          f"{lookups / batched:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+db_pool.py is kept as an identical copy of python-decorators-0x01's
+module so each project directory runs on its own; fail when they drift.
+"""
+
+import os
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ORIGINAL = os.path.join(HERE, os.pardir, "python-decorators-0x01",
+                        "db_pool.py")
+
+
+class TestDbPoolCopy(unittest.TestCase):
+    """Tests that both db_pool.py copies match byte for byte."""
+
+    def test_copy_matches_original(self):
+        with open(os.path.join(HERE, "db_pool.py"), "rb") as copy, \
+                open(ORIGINAL, "rb") as original:
+            self.assertEqual(copy.read(), original.read(),
+                             "db_pool.py differs from "
+                             "python-decorators-0x01/db_pool.py; "
+                             "copy the updated module over")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,162 @@
 import sqlite3
 import functools
-from datetime import datetime
+import inspect
+import logging
+import random
+import re
+import sys
+import threading
+import time
 
+from db_pool import iter_rows
+
+logger = logging.getLogger("queries")
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(query):
+    """Normalize a query so calls differing only in literals group together."""
+    query = _LITERALS.sub("?", query or "")
+    query = _IN_LISTS.sub("(?+)", query)
+    return _SPACES.sub(" ", query).strip()
+
+
+class QueryProfiler:
+    """
+    In-process query timings grouped by fingerprint: calls, errors, rows,
+    total/max wall time and a latency histogram. Only a sample_rate share
+    of calls is timed (0 turns timing off), so every counter is a sampled
+    count; report() adds est_calls, calls scaled up by the sample rate.
+    Queries slower than slow_threshold seconds are logged as warnings.
+    """
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self, sample_rate=1.0, slow_threshold=0.5):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"sample_rate must be in [0, 1], "
+                             f"got {sample_rate!r}")
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def record(self, query, elapsed, rows=0, error=None):
+        key = fingerprint(query)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {
+                    "calls": 0, "errors": 0, "rows": 0, "total": 0.0,
+                    "max": 0.0, "histogram": [0] * (len(self.BUCKETS) + 1),
+                }
+            stats["calls"] += 1
+            stats["rows"] += rows
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+            bucket = 0
+            while bucket < len(self.BUCKETS) and elapsed > self.BUCKETS[bucket]:
+                bucket += 1
+            stats["histogram"][bucket] += 1
+            if error is not None:
+                stats["errors"] += 1
+        if elapsed >= self.slow_threshold:
+            logger.warning("Slow query (%.1f ms, %d rows): %s",
+                           elapsed * 1000, rows, query)
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Query (%.1f ms, %d rows): %s",
+                         elapsed * 1000, rows, query)
+
+    def report(self, n=10, by="total"):
+        """Top n fingerprints ordered by total, max, calls or errors."""
+        with self._lock:
+            items = [dict(stats, fingerprint=key,
+                          histogram=list(stats["histogram"]))
+                     for key, stats in self._stats.items()]
+        # Only record() fills stats with sample_rate 0; count those as is
+        scale = 1 / self.sample_rate if self.sample_rate else 1
+        for item in items:
+            item["mean"] = item["total"] / item["calls"]
+            item["est_calls"] = round(item["calls"] * scale)
+        return sorted(items, key=lambda item: item[by], reverse=True)[:n]
+
+    def dump_report(self, n=10, by="total", file=sys.stdout):
+        """Print report(); est calls is the only column scaled up."""
+        print(f"{'calls':>7} {'est calls':>9} {'errors':>6} {'rows':>8} "
+              f"{'total ms':>10} {'mean ms':>8} {'max ms':>8}  query",
+              file=file)
+        for item in self.report(n, by):
+            print(f"{item['calls']:>7} {item['est_calls']:>9} "
+                  f"{item['errors']:>6} "
+                  f"{item['rows']:>8} {item['total'] * 1000:>10.1f} "
+                  f"{item['mean'] * 1000:>8.2f} {item['max'] * 1000:>8.2f}  "
+                  f"{item['fingerprint']}", file=file)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+default_profiler = QueryProfiler()
+
+
+def _row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    return 0 if result is None else 1
+
+
+def _profiled(rows, profiler, query, start):
+    """Pass a row generator through, recording the query when it ends."""
+    count = 0
+    error = None
+    try:
+        for row in rows:
+            count += 1
+            yield row
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        rows.close()
+        profiler.record(query, time.perf_counter() - start, count,
+                        error=error)
+
+
+def log_queries(func=None, *, profiler=None):
+    """
+    Decorator that times each (sampled) call of a query function and
+    records wall time, rows returned and exceptions in a QueryProfiler.
+    A generator result is recorded once it is exhausted or closed, so the
+    time includes the consumer's work between rows. Every call, sampled or
+    not, logs "Executing query: ..." at INFO on the "queries" logger; it
+    only shows once logging is configured at INFO or below.
+    """
+    if func is None:
+        return functools.partial(log_queries, profiler=profiler)
+    target = profiler or default_profiler
 
-def log_queries(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         query = args[0] if args else kwargs.get('query')
-        print(f"[{datetime.now()}] Executing query: {query}")
-        return func(*args, **kwargs)
+        logger.info("Executing query: %s", query)
+        if not target.sampled():
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            target.record(query, time.perf_counter() - start, error=e)
+            raise
+        if inspect.isgenerator(result):
+            return _profiled(result, target, query, start)
+        target.record(query, time.perf_counter() - start, _row_count(result))
+        return result
     return wrapper
 
 
@@ -22,6 +170,20 @@ def fetch_all_users(query):
     return results
 
 
-# Example usage
-users = fetch_all_users(query="SELECT * FROM users")
-print(users)
+@log_queries
+def stream_all_users(query, chunk_size=500):
+    """fetch_all_users as a generator, holding the connection until done."""
+    conn = sqlite3.connect('users.db')
+    try:
+        yield from iter_rows(conn.execute(query), chunk_size)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG,
+                        format="[%(asctime)s] %(message)s")
+    # Example usage
+    users = fetch_all_users(query="SELECT * FROM users")
+    print(users)
+    default_profiler.dump_report()
@@ -1,22 +1,34 @@
-import sqlite3
 import functools
 
+from db_pool import get_pool, in_list_chunks
+
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-            return result
-        finally:
-            conn.close()
+        with get_pool('users.db').connection() as conn:
+            return func(conn, *args, **kwargs)
     return wrapper
 
 @with_db_connection
 def get_user_by_id(conn, user_id):
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    cursor = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,))
     return cursor.fetchone()
 
+@with_db_connection
+def get_users_by_ids(conn, user_ids):
+    """
+    Batch form of get_user_by_id: one statement per db_pool.MAX_IN_LIST
+    ids instead of one per id. Returns rows in the order of user_ids (None if missing).
+    sqlite's executemany only accepts DML, so the batch is an IN list.
+    """
+    user_ids = list(user_ids)
+    found = {}
+    for placeholders, chunk in in_list_chunks(user_ids):
+        cursor = conn.execute(
+            f"SELECT * FROM users WHERE id IN ({placeholders})", chunk)
+        found.update((row[0], row) for row in cursor.fetchall())
+    return [found.get(user_id) for user_id in user_ids]
+
 user = get_user_by_id(user_id=1)
-print(user)
\ No newline at end of file
+print(user)
+print(get_users_by_ids(user_ids=[1, 2, 3]))
\ No newline at end of file
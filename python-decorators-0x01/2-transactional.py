@@ -1,33 +1,218 @@
-import sqlite3
 import functools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import db_cache
+from db_pool import DEFAULT_PROFILE, connect, get_pool
 
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-            return result
-        finally:
-            conn.close()
+        with get_pool('users.db').connection() as conn:
+            return func(conn, *args, **kwargs)
     return wrapper
 
 def transactional(func):
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        # Record the statements so cached reads of the written tables can be
+        # invalidated once the transaction commits
+        statements = []
+        conn.set_trace_callback(statements.append)
         try:
             result = func(conn, *args, **kwargs)
             conn.commit()
-            return result
         except Exception as e:
             conn.rollback()
             raise e
+        finally:
+            conn.set_trace_callback(None)
+        db_cache.invalidate_tables(db_cache.tables_written(statements))
+        return result
     return wrapper
 
+class GroupCommitter:
+    """
+    Group commit for small writes: callers on any thread submit operations
+    (functions taking a connection) to a queue, and one writer thread runs
+    them in a shared transaction. The writer takes whatever is already
+    queued (up to max_batch, and for at most max_delay seconds while more
+    keeps arriving) and commits right away, so a lone call is not delayed
+    and the next batch builds up while a commit runs.
+    Each operation runs inside its own SAVEPOINT, so a failing operation is
+    rolled back alone and only its caller sees the error. Operations must
+    not commit or roll back themselves. If the writer thread dies (e.g. the
+    database can't be opened), every queued and in-flight call fails with
+    that error and the next submit() starts a new writer.
+    The gain depends on what a commit costs: with the default "wal" profile
+    (synchronous=NORMAL, no fsync per commit) it is small, with the
+    "durable" profile (an fsync per commit) it is large; see
+    bench_group_commit.py.
+    """
+
+    def __init__(self, database, max_batch=256, max_delay=0.005,
+                 profile=DEFAULT_PROFILE):
+        self.database = database
+        self.profile = profile
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.operations = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(conn, *args, **kwargs); returns a Future."""
+        future = Future()
+        with self._lock:
+            # Queued under the lock so a dying writer can't miss the item
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._queue.put((future, func, args, kwargs))
+        return future
+
+    def close(self):
+        """Flush what is queued and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        batch = []
+        try:
+            conn = connect(self.database, isolation_level=None,
+                           profile=self.profile)
+            try:
+                self._serve(conn, batch)
+            finally:
+                conn.close()
+        except BaseException as e:
+            self._fail(batch, e)
+
+    def _serve(self, conn, batch):
+        """Flush batches until close(); batch holds the one in flight."""
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch[:] = [item]
+            deadline = time.monotonic() + self.max_delay
+            while (len(batch) < self.max_batch
+                   and time.monotonic() < deadline):
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._flush(conn, batch)
+            batch.clear()
+
+    def _fail(self, batch, error):
+        """Writer died: fail the in-flight batch and whatever is queued."""
+        with self._lock:
+            pending = list(batch)
+            if self._thread in (threading.current_thread(), None):
+                self._thread = None
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        pending.append(item)
+        for future, _, _, _ in pending:
+            if not future.done():
+                future.set_exception(error)
+
+    def _flush(self, conn, batch):
+        statements = []
+        outcomes = []
+        conn.set_trace_callback(statements.append)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for future, func, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT operation")
+                try:
+                    outcomes.append((future, func(conn, *args, **kwargs), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO operation")
+                    outcomes.append((future, None, e))
+                conn.execute("RELEASE operation")
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for future, _, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            conn.set_trace_callback(None)
+        self.batches += 1
+        self.operations += len(outcomes)
+        db_cache.invalidate_tables(db_cache.tables_written(statements))
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_committers = {}
+_committers_lock = threading.Lock()
+
+
+def get_committer(database, **kwargs):
+    """Process-wide GroupCommitter for database, created on first use."""
+    with _committers_lock:
+        committer = _committers.get(database)
+        if committer is None:
+            committer = _committers[database] = GroupCommitter(database,
+                                                               **kwargs)
+        return committer
+
+
+def group_commit(database='users.db', **kwargs):
+    """
+    Decorator: calls run through the database's GroupCommitter and block
+    until their group commits, returning the result or raising the error
+    of that call only. wrapper.submit(...) returns the Future instead.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kw):
+            return wrapper.submit(*args, **kw).result()
+
+        def submit(*args, **kw):
+            return get_committer(database, **kwargs).submit(func, *args, **kw)
+        wrapper.submit = submit
+        return wrapper
+    return decorator
+
 @with_db_connection
 @transactional
 def update_user_email(conn, user_id, new_email):
     cursor = conn.cursor()
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
 
-update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
\ No newline at end of file
+@group_commit('users.db')
+def update_user_email_grouped(conn, user_id, new_email):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
+if __name__ == "__main__":
+    update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
+    update_user_email_grouped(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
\ No newline at end of file
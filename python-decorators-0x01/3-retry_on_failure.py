@@ -1,41 +1,239 @@
 import time
 import sqlite3
+import asyncio
 import functools
+import inspect
+import random
+import threading
+
+from db_pool import get_pool, iter_rows
 
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
+        with get_pool("users.db", read_only=True).connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
-def retry_on_failure(retries=3, delay=2):
-    """Retry decorator for transient database errors"""
+def with_db_stream(func):
+    """with_db_connection for generators: the connection is held until
+    the rows are exhausted or the generator is closed."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with get_pool("users.db", read_only=True).connection() as conn:
+            yield from func(conn, *args, **kwargs)
+    return wrapper
+
+def is_retryable(exc):
+    """True for transient lock/busy errors worth retrying."""
+    if not isinstance(exc, sqlite3.OperationalError):
+        return False
+    code = getattr(exc, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message
+
+
+class RetryBudget:
+    """
+    Token bucket shared by retrying callers. Every call deposits `ratio`
+    tokens and every retry withdraws one, so under sustained failure
+    retries stay near ratio * calls instead of multiplying the load; a
+    floor of min_per_sec retries per second is always allowed.
+    """
+
+    def __init__(self, ratio=0.2, min_per_sec=10.0, max_tokens=100.0):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._reserve = min_per_sec
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """Take one retry token; False if the budget is exhausted."""
+        with self._lock:
+            now = time.monotonic()
+            self._reserve = min(self.min_per_sec, self._reserve
+                                + (now - self._last) * self.min_per_sec)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            if self._reserve >= 1:
+                self._reserve -= 1
+                return True
+            return False
+
+
+class RetryStats:
+    """Attempt, retry and latency counters for one decorated function."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.budget_exhausted = 0
+        self.sleep_time = 0.0
+        self.latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, attempts, latency, slept, failed):
+        with self._lock:
+            self.calls += 1
+            self.attempts += attempts
+            self.retries += attempts - 1
+            self.failures += failed
+            self.sleep_time += slept
+            self.latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def record_budget_exhausted(self):
+        with self._lock:
+            self.budget_exhausted += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "failures": self.failures,
+                "budget_exhausted": self.budget_exhausted,
+                "sleep_time": self.sleep_time,
+                "avg_latency": self.latency / self.calls if self.calls else 0.0,
+                "max_latency": self.max_latency,
+            }
+
+
+# Marks an empty generator in _primed
+_END = object()
+
+
+def _primed(rows):
+    """
+    Wrap a row generator so that one next() on the wrapper fetches the
+    first row: errors from running the query then surface inside the
+    retry loop instead of mid-iteration.
+    """
+    try:
+        first = next(rows, _END)
+        yield
+        if first is not _END:
+            yield first
+            yield from rows
+    finally:
+        rows.close()
+
+
+# Process-wide budget shared by every retry_on_failure by default
+default_budget = RetryBudget()
+
+
+def retry_on_failure(retries=3, delay=2, backoff=2.0, max_delay=30.0,
+                     budget=default_budget, retry_if=is_retryable):
+    """
+    Retry decorator for transient database errors.
+    Makes up to `retries` attempts. Before attempt n+1 it sleeps a random
+    time between 0 and min(max_delay, delay * backoff ** (n - 1)) ("full
+    jitter"), so workers that failed together do not retry in lockstep.
+    Only errors accepted by retry_if are retried, and each retry needs a
+    token from `budget` (None disables the budget). Coroutine functions
+    get an async wrapper that awaits asyncio.sleep instead of blocking.
+    Generator results are started before returning, so a failure up to
+    the first row is retried; later ones propagate to the consumer, since
+    rows were already handed out.
+    Counters are available as wrapper.retry_stats.
+    """
     def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            last_exception = None
-            for _ in range(retries):
-                try:
-                    return func(*args, **kwargs)
-                except sqlite3.OperationalError as e:
-                    last_exception = e
-                    time.sleep(delay)
-            # if all retries fail, raise the last exception
-            raise last_exception
+        stats = RetryStats()
+
+        def next_delay(attempt, error):
+            """Seconds to wait before retrying, or None to give up."""
+            if attempt >= retries or not retry_if(error):
+                return None
+            if budget is not None and not budget.withdraw():
+                stats.record_budget_exhausted()
+                return None
+            return random.uniform(0, min(max_delay,
+                                         delay * backoff ** (attempt - 1)))
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if budget is not None:
+                    budget.deposit()
+                start = time.perf_counter()
+                slept = 0.0
+                attempt = 0
+                while True:
+                    attempt += 1
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        wait = next_delay(attempt, e)
+                        if wait is None:
+                            stats.record(attempt, time.perf_counter() - start,
+                                         slept, True)
+                            raise
+                        slept += wait
+                        await asyncio.sleep(wait)
+                        continue
+                    stats.record(attempt, time.perf_counter() - start,
+                                 slept, False)
+                    return result
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if budget is not None:
+                    budget.deposit()
+                start = time.perf_counter()
+                slept = 0.0
+                attempt = 0
+                while True:
+                    attempt += 1
+                    try:
+                        result = func(*args, **kwargs)
+                        if inspect.isgenerator(result):
+                            result = _primed(result)
+                            next(result)
+                    except Exception as e:
+                        wait = next_delay(attempt, e)
+                        if wait is None:
+                            stats.record(attempt, time.perf_counter() - start,
+                                         slept, True)
+                            raise
+                        slept += wait
+                        time.sleep(wait)
+                        continue
+                    stats.record(attempt, time.perf_counter() - start,
+                                 slept, False)
+                    return result
+
+        wrapper.retry_stats = stats
         return wrapper
     return decorator
 
 @with_db_connection
 @retry_on_failure(retries=3, delay=1)
 def fetch_users_with_retry(conn):
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users")
+    cursor = conn.execute("SELECT * FROM users")
     return cursor.fetchall()
 
-# Attempt to fetch users
-users = fetch_users_with_retry()
-print(users)
+@with_db_stream
+@retry_on_failure(retries=3, delay=1)
+def stream_users_with_retry(conn, chunk_size=500):
+    return iter_rows(conn.execute("SELECT * FROM users"), chunk_size)
+
+if __name__ == "__main__":
+    # Attempt to fetch users
+    users = fetch_users_with_retry()
+    print(users)
@@ -1,27 +1,104 @@
-import sqlite3
+import contextlib
 import functools
+import inspect
 
-query_cache = {}
+from db_pool import get_pool, iter_rows
+
+import db_cache
+
+# Shared LRU/TTL cache; writes through transactional invalidate its entries
+query_cache = db_cache.default_cache
 
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
+        with get_pool("users.db", read_only=True).connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
-def cache_query(func):
-    """Decorator that caches query results based on SQL query string"""
+def with_db_stream(func):
+    """with_db_connection for generators: the connection is held until
+    the rows are exhausted or the generator is closed."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with get_pool("users.db", read_only=True).connection() as conn:
+            yield from func(conn, *args, **kwargs)
+    return wrapper
+
+def _cache_stream(func, store, ttl, max_bytes):
+    """
+    cache_query for generator functions: hits replay the cached rows;
+    misses stream the query's rows through and cache them once exhausted,
+    unless they add up to more than max_bytes or the consumer stops early.
+    """
     @functools.wraps(func)
     def wrapper(conn, query, *args, **kwargs):
-        if query in query_cache:
-            return query_cache[query]
-        result = func(conn, query, *args, **kwargs)
-        query_cache[query] = result
-        return result
+        key = db_cache.make_key(query, args, kwargs)
+        result = store.get(key)
+        if result is not db_cache.MISSING:
+            yield from result
+            return
+        version = store.version()
+        kept, size = [], 0
+        with contextlib.closing(func(conn, query, *args, **kwargs)) as rows:
+            for row in rows:
+                if kept is not None:
+                    size += db_cache.sizeof(row)
+                    if size > max_bytes:
+                        kept = None
+                    else:
+                        kept.append(row)
+                yield row
+        if kept is not None:
+            store.set(key, kept, tables=db_cache.tables_read(query),
+                      ttl=ttl, version=version)
+    wrapper.cache = store
+    return wrapper
+
+def cache_query(func=None, *, cache=None, ttl=None, stale_ttl=None,
+                max_stream_bytes=1 << 20):
+    """
+    Decorator that caches query results based on the SQL query string and
+    its parameters. Use bare or as cache_query(cache=..., ttl=seconds).
+    - concurrent misses on one key run the query once and share the result
+      (or the exception; failures are never cached)
+    - with stale_ttl, an expired result is still served for that many
+      seconds while the first caller to see it runs the query again
+    - generator functions stay lazy (see _cache_stream); results over
+      max_stream_bytes are not cached, and misses are not coalesced
+    """
+    if func is None:
+        return functools.partial(cache_query, cache=cache, ttl=ttl,
+                                 stale_ttl=stale_ttl,
+                                 max_stream_bytes=max_stream_bytes)
+    store = query_cache if cache is None else cache
+    if inspect.isgeneratorfunction(func):
+        return _cache_stream(func, store, ttl, max_stream_bytes)
+    flights = db_cache.SingleFlight()
+
+    @functools.wraps(func)
+    def wrapper(conn, query, *args, **kwargs):
+        key = db_cache.make_key(query, args, kwargs)
+
+        def load():
+            version = store.version()
+            result = func(conn, query, *args, **kwargs)
+            store.set(key, result, tables=db_cache.tables_read(query),
+                      ttl=ttl, version=version, stale=stale_ttl)
+            return result
+
+        if stale_ttl is None:
+            result = store.get(key)
+        else:
+            result, stale = store.get_stale(key)
+            if stale:
+                fresh = flights.try_do(key, load)
+                return result if fresh is db_cache.MISSING else fresh
+        if result is not db_cache.MISSING:
+            return result
+        return flights.do(key, load)
+    wrapper.cache = store
+    wrapper.flights = flights
     return wrapper
 
 @with_db_connection
@@ -31,10 +108,16 @@ def fetch_users_with_cache(conn, query):
     cursor.execute(query)
     return cursor.fetchall()
 
-# First call caches the result
-users = fetch_users_with_cache(query="SELECT * FROM users")
-# Second call retrieves cached result
-users_again = fetch_users_with_cache(query="SELECT * FROM users")
+@with_db_stream
+@cache_query
+def stream_users_with_cache(conn, query, chunk_size=500):
+    yield from iter_rows(conn.execute(query), chunk_size)
+
+if __name__ == "__main__":
+    # First call caches the result
+    users = fetch_users_with_cache(query="SELECT * FROM users")
+    # Second call retrieves cached result
+    users_again = fetch_users_with_cache(query="SELECT * FROM users")
 
-print(users)
-print(users_again)
+    print(users)
+    print(users_again)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+bench_group_commit.py
+- Bulk email updates from several threads: one transaction (and commit)
+  per call through transactional, against group commit through
+  GroupCommitter. Uses a throwaway users database.
+- The gain tracks the cost of a commit. Under the default "wal" profile
+  (synchronous=NORMAL) commits don't fsync, and blocking group commit is
+  only ~1.2x a commit per call (16k vs 13-14k updates/sec, 8 threads),
+  far short of an order of magnitude. Under "durable" (an fsync per
+  commit) blocking group commit is ~2.3x and pipelined ~6x (4.5k and
+  11.8k vs 1.9k updates/sec); pass the profile as the third argument.
+Usage: ./bench_group_commit.py [threads] [updates_per_thread] [profile]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from db_pool import DEFAULT_PROFILE, ConnectionPool
+
+transactions = __import__('2-transactional')
+
+UPDATE = "UPDATE users SET email = ? WHERE id = ?"
+
+
+def make_db(path, rows=1000):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+                 "email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                     [(i, f"user{i}", f"user{i}@example.com", i % 90)
+                      for i in range(1, rows + 1)])
+    conn.commit()
+    conn.close()
+
+
+@transactions.transactional
+def set_email(conn, user_id, email):
+    conn.execute(UPDATE, (email, user_id))
+
+
+def set_email_op(conn, user_id, email):
+    conn.execute(UPDATE, (email, user_id))
+
+
+def run(threads, updates, call):
+    def worker(n):
+        results = [call(i % 1000 + 1, f"t{n}-{i}@example.com")
+                   for i in range(updates)]
+        for result in results:
+            if result is not None:
+                result.result()
+
+    workers = [threading.Thread(target=worker, args=(n,))
+               for n in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return threads * updates / (time.perf_counter() - start)
+
+
+def main(threads=8, updates=200, profile=DEFAULT_PROFILE):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.db")
+        make_db(path)
+        pool = ConnectionPool(path, max_size=threads, timeout=60,
+                              profile=profile)
+
+        def per_call(user_id, email):
+            with pool.connection() as conn:
+                set_email(conn, user_id, email)
+
+        committer = transactions.GroupCommitter(path, profile=profile)
+
+        def grouped(user_id, email):
+            committer.submit(set_email_op, user_id, email).result()
+
+        def pipelined(user_id, email):
+            # Waits for the futures only after submitting every update
+            return committer.submit(set_email_op, user_id, email)
+
+        print(f"threads={threads} updates={threads * updates} "
+              f"profile={profile}")
+        rate = run(threads, updates, per_call)
+        print(f"per-call commit:         {rate:>10,.0f} updates/sec")
+        for name, call in (("group commit", grouped),
+                           ("group commit, pipelined", pipelined)):
+            committer.batches = committer.operations = 0
+            rate = run(threads, updates, call)
+            print(f"{name + ':':<24} {rate:>10,.0f} updates/sec "
+                  f"({committer.operations / committer.batches:.1f} "
+                  f"per commit)")
+        committer.close()
+        pool.close()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]], *sys.argv[3:4])
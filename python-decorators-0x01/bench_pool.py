@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+bench_pool.py
+- Calls/sec of a get_user_by_id style query opening a fresh sqlite3
+  connection per call, against borrowing one from db_pool, for a few
+  thread counts. Uses a throwaway users database.
+Usage: ./bench_pool.py [calls_per_thread]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from db_pool import ConnectionPool
+
+QUERY = "SELECT * FROM users WHERE id = ?"
+
+
+def make_db(path, rows=1000):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+                 "email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                     [(i, f"user{i}", f"user{i}@example.com", i % 90)
+                      for i in range(1, rows + 1)])
+    conn.commit()
+    conn.close()
+
+
+def connect_per_call(path, user_id):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(QUERY, (user_id,)).fetchone()
+    finally:
+        conn.close()
+
+
+def pooled(pool, user_id):
+    with pool.connection() as conn:
+        return conn.execute(QUERY, (user_id,)).fetchone()
+
+
+def run(call, target, threads, calls):
+    def worker():
+        for i in range(calls):
+            call(target, i % 1000 + 1)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return threads * calls / (time.perf_counter() - start)
+
+
+def main(calls=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.db")
+        make_db(path)
+        print(f"{'threads':>7} {'connect/call':>13} {'pooled':>10} "
+              f"{'waits':>6} {'avg wait ms':>12}")
+        for threads in (1, 4, 16):
+            pool = ConnectionPool(path, max_size=4)
+            before = run(connect_per_call, path, threads, calls)
+            after = run(pooled, pool, threads, calls)
+            stats = pool.stats()
+            pool.close()
+            print(f"{threads:>7} {before:>13,.0f} {after:>10,.0f} "
+                  f"{stats['waits']:>6} {stats['avg_wait'] * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+bench_profiles.py
+- Mixed read/write throughput for each db_pool profile: writer threads
+  update a row and commit, reader threads look users up by id on
+  read-only connections, all for a fixed duration against a throwaway
+  users database.
+- Reports reads/sec, writes/sec and "database is locked" errors.
+Usage: ./bench_profiles.py [seconds] [readers] [writers]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from db_pool import PROFILES, connect
+
+READ = "SELECT * FROM users WHERE id = ?"
+WRITE = "UPDATE users SET email = ? WHERE id = ?"
+
+
+def make_db(path, profile, rows=1000):
+    conn = connect(path, profile=profile)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+                 "email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                     [(i, f"user{i}", f"user{i}@example.com", i % 90)
+                      for i in range(1, rows + 1)])
+    conn.commit()
+    conn.close()
+
+
+def run(path, profile, seconds, readers, writers):
+    counts = {"reads": 0, "writes": 0, "busy": 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def worker(read_only):
+        conn = connect(path, profile=profile, read_only=read_only)
+        done = busy = i = 0
+        while time.monotonic() < stop:
+            i += 1
+            try:
+                if read_only:
+                    conn.execute(READ, (i % 1000 + 1,)).fetchall()
+                else:
+                    conn.execute(WRITE, (f"{i}@example.com", i % 1000 + 1))
+                    conn.commit()
+                done += 1
+            except sqlite3.OperationalError:
+                if conn.in_transaction:
+                    conn.rollback()
+                busy += 1
+        conn.close()
+        with lock:
+            counts["reads" if read_only else "writes"] += done
+            counts["busy"] += busy
+
+    threads = ([threading.Thread(target=worker, args=(True,))
+                for _ in range(readers)] +
+               [threading.Thread(target=worker, args=(False,))
+                for _ in range(writers)])
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def main(seconds=2, readers=4, writers=1):
+    print(f"seconds={seconds} readers={readers} writers={writers}")
+    print(f"{'profile':>9} {'reads/sec':>12} {'writes/sec':>12} {'busy':>6}")
+    for profile in PROFILES:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "users.db")
+            make_db(path, profile)
+            counts = run(path, profile, seconds, readers, writers)
+        print(f"{profile:>9} {counts['reads'] / seconds:>12,.0f} "
+              f"{counts['writes'] / seconds:>12,.0f} {counts['busy']:>6}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:4]])
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+bench_streaming.py
+- Peak RSS of reading every user through the fetchall() fetch functions
+  against their streaming variants, over a throwaway users database.
+  Each mode runs in its own process so peaks don't carry over; "delta"
+  is the peak above the RSS measured right after importing the modules.
+  Pooled connections (retry and cache) memory-map the database file, so
+  their figures include the mapped pages they touched.
+Usage: ./bench_streaming.py [rows]
+"""
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+QUERY = "SELECT * FROM users"
+
+MODES = {
+    "fetch_all_users": ("0-log_queries", "fetch_all_users", (QUERY,)),
+    "stream_all_users": ("0-log_queries", "stream_all_users", (QUERY,)),
+    "fetch_users_with_retry": ("3-retry_on_failure",
+                               "fetch_users_with_retry", ()),
+    "stream_users_with_retry": ("3-retry_on_failure",
+                                "stream_users_with_retry", ()),
+    "fetch_users_with_cache": ("4-cache_query", "fetch_users_with_cache",
+                               (QUERY,)),
+    "stream_users_with_cache": ("4-cache_query", "stream_users_with_cache",
+                                (QUERY,)),
+}
+
+
+def make_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+                 "email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                     ((i, f"user{i} " + "x" * 40, f"user{i}@example.com",
+                       i % 90) for i in range(1, rows + 1)))
+    conn.commit()
+    conn.close()
+
+
+def peak_kib():
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def child(mode):
+    """Run one mode in this process and print rows, seconds, peak, delta."""
+    module, name, args = MODES[mode]
+    sys.path.insert(0, HERE)
+    func = getattr(__import__(module), name)
+    base = peak_kib()
+    start = time.perf_counter()
+    rows = sum(1 for _ in func(*args))
+    print(rows, time.perf_counter() - start, peak_kib(), peak_kib() - base)
+
+
+def main(rows=200000):
+    with tempfile.TemporaryDirectory() as tmp:
+        make_db(os.path.join(tmp, "users.db"), rows)
+        print(f"rows={rows}")
+        print(f"{'mode':>24} {'rows':>8} {'seconds':>8} {'peak MiB':>9} "
+              f"{'delta MiB':>10}")
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode],
+                cwd=tmp, capture_output=True, text=True, check=True).stdout
+            count, seconds, peak, delta = out.split()
+            print(f"{mode:>24} {int(count):>8} {float(seconds):>8.2f} "
+                  f"{int(peak) / 1024:>9.1f} {int(delta) / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(sys.argv[2])
+    else:
+        main(*[int(a) for a in sys.argv[1:2]])
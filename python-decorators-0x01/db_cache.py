@@ -0,0 +1,483 @@
+import hashlib
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from db_pool import connect
+
+# Returned by QueryCache.get on a miss (None is a valid cached result)
+MISSING = object()
+
+_READ_TABLES = re.compile(r'\b(?:FROM|JOIN)\s+["`\[]?(\w+)', re.IGNORECASE)
+_WRITE_TABLES = re.compile(
+    r'\b(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO'
+    r'|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+["`\[]?(\w+)',
+    re.IGNORECASE
+)
+
+# Every QueryCache registers here so writers can invalidate all of them
+_caches = weakref.WeakSet()
+
+
+def tables_read(query):
+    """Names of the tables a SELECT reads (lower-cased)."""
+    return frozenset(t.lower() for t in _READ_TABLES.findall(query))
+
+
+def tables_written(statements):
+    """Names of the tables modified by an iterable of SQL statements."""
+    return frozenset(t.lower() for sql in statements
+                     for t in _WRITE_TABLES.findall(sql))
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def make_key(query, args=(), kwargs=None):
+    """Cache key for a query and its parameters."""
+    return (query, _freeze(args), _freeze(kwargs or {}))
+
+
+def sizeof(value):
+    """Approximate memory footprint of a result (rows of scalars)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(sizeof(v) for v in value)
+    elif isinstance(value, dict):
+        size += sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    return size
+
+
+def invalidate_tables(tables):
+    """Drop entries that read any of tables from every registered cache."""
+    if tables:
+        for cache in list(_caches):
+            cache.invalidate_tables(tables)
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results, bounded by entry count and by
+    (approximate) bytes, with optional per-entry TTL. Each entry remembers
+    the tables its query read so writes can invalidate it. Entries stored
+    with a stale window stay readable through get_stale() for that long
+    after they expire.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024,
+                 ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (value, size, expires, tables, stale until)
+        self._entries = OrderedDict()
+        self._by_table = {}            # table -> set of keys
+        self._lock = threading.RLock()
+        self._version = 0              # bumped by every invalidation
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        _caches.add(self)
+
+    def version(self):
+        """Token to pass to set(); stale if a write lands in between."""
+        return self._version
+
+    def get(self, key):
+        """Return the cached value for key, or MISSING."""
+        return self._lookup(key, allow_stale=False)[0]
+
+    def get_stale(self, key):
+        """
+        Return (value, stale) for key: expired entries still inside their
+        stale window come back with stale=True, otherwise like get().
+        """
+        return self._lookup(key, allow_stale=True)
+
+    def _lookup(self, key, allow_stale):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING, False
+            now = time.monotonic()
+            if entry[2] is not None and entry[2] <= now:
+                if entry[4] is not None and now < entry[4]:
+                    if allow_stale:
+                        self._entries.move_to_end(key)
+                        self.stale_hits += 1
+                        return entry[0], True
+                else:
+                    self._remove(key)
+                    self.expirations += 1
+                self.misses += 1
+                return MISSING, False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], False
+
+    def set(self, key, value, tables=(), ttl=None, version=None,
+            stale=None):
+        """
+        Store value under key, servable by get_stale() for stale seconds
+        past its expiry. Values larger than max_bytes are not cached, nor
+        is anything computed before an invalidation that happened after
+        version() was taken.
+        """
+        size = sizeof(value)
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+        stale_until = expires + stale if expires and stale else None
+        with self._lock:
+            if size > self.max_bytes:
+                return False
+            if version is not None and version != self._version:
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires, frozenset(tables),
+                                  stale_until)
+            self.bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while (len(self._entries) > self.max_entries
+                   or self.bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            return True
+
+    def invalidate_tables(self, tables):
+        """Drop every entry whose query read one of tables."""
+        with self._lock:
+            self._version += 1
+            for table in tables:
+                for key in self._by_table.pop(table.lower(), ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._by_table.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key):
+        _, size, _, tables, _ = self._entries.pop(key)
+        self.bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls per key: the first caller (the leader) runs
+    the function, callers arriving while it runs wait for and share its
+    result or exception. Nothing is remembered once the call finishes.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> Future of the call in flight
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, func):
+        """Run func() for key, or wait for the call already in flight."""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        return self._run(key, future, func)
+
+    def try_do(self, key, func):
+        """Run func() for key unless a call is in flight; then MISSING."""
+        future, leader = self._join(key)
+        if not leader:
+            return MISSING
+        return self._run(key, future, func)
+
+    def _join(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.calls += 1
+            return future, True
+
+    def _run(self, key, future, func):
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+# Pseudo-table every SqliteCache entry depends on; bumped by clear()
+_ALL_TABLES = "*"
+
+_SQLITE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key BLOB PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    versions BLOB NOT NULL,
+    expires REAL,
+    stale_until REAL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_created ON entries (created);
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+class SqliteCache:
+    """
+    Query result cache in a local sqlite file, shared by every process on
+    the host that opens the same path (e.g. all gunicorn workers), with
+    the QueryCache interface so cache_query can use either.
+    - values are stored marshal-encoded, so only plain rows of scalars,
+      tuples, lists and dicts can be cached; others are skipped
+    - each entry records the version of every table its query read;
+      invalidate_tables() bumps those per-table counters, so a write in
+      any process that opened the cache invalidates the entry for all
+    - bounded by max_bytes of encoded values, evicting oldest entries
+      first; ttl and stale windows work as in QueryCache
+    """
+    EVICT_EVERY = 64  # sets between size checks
+
+    def __init__(self, path="query_cache.db", max_bytes=256 * 1024 * 1024,
+                 ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._conns = []
+        self._lock = threading.Lock()
+        self._sets = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._conn().executescript(_SQLITE_CACHE_SCHEMA)
+        _caches.add(self)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path,
+                                              isolation_level=None)
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    @staticmethod
+    def _key(key):
+        try:
+            data = marshal.dumps(key)
+        except ValueError:
+            data = repr(key).encode()
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def version(self):
+        """Token to pass to set(): the current per-table versions."""
+        return dict(self._conn().execute(
+            "SELECT name, version FROM table_versions"))
+
+    def get(self, key):
+        """Return the cached value for key, or MISSING."""
+        return self._lookup(key, allow_stale=False)[0]
+
+    def get_stale(self, key):
+        """Like QueryCache.get_stale()."""
+        return self._lookup(key, allow_stale=True)
+
+    def _lookup(self, key, allow_stale):
+        conn = self._conn()
+        key = self._key(key)
+        row = conn.execute(
+            "SELECT value, versions, expires, stale_until, created "
+            "FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count("misses")
+            return MISSING, False
+        value, versions, expires, stale_until, created = row
+        current = self.version()
+        now = time.time()
+        if any(current.get(table, 0) != version
+               for table, version in marshal.loads(versions)):
+            self._count("invalidations")
+        elif expires is not None and expires <= now:
+            if stale_until is not None and now < stale_until:
+                if allow_stale:
+                    self._count("stale_hits")
+                    return marshal.loads(value), True
+                self._count("misses")
+                return MISSING, False
+            self._count("expirations")
+        else:
+            self._count("hits")
+            return marshal.loads(value), False
+        conn.execute("DELETE FROM entries WHERE key = ? AND created = ?",
+                     (key, created))
+        self._count("misses")
+        return MISSING, False
+
+    def set(self, key, value, tables=(), ttl=None, version=None,
+            stale=None):
+        """
+        Store value under key as QueryCache.set() does. Entries computed
+        before a write to one of tables (after version() was taken) are
+        stored with the old table versions, so they never hit.
+        """
+        try:
+            data = marshal.dumps(value)
+        except ValueError:
+            return False
+        if len(data) > self.max_bytes:
+            return False
+        current = self.version() if version is None else version
+        tables = {table.lower() for table in tables} | {_ALL_TABLES}
+        versions = marshal.dumps(tuple(sorted(
+            (table, current.get(table, 0)) for table in tables)))
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        stale_until = expires + stale if expires and stale else None
+        self._conn().execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self._key(key), data, len(data), versions, expires,
+             stale_until, now))
+        with self._lock:
+            self._sets += 1
+            evict = self._sets % self.EVICT_EVERY == 0
+        if evict:
+            self._evict()
+        return True
+
+    def _evict(self):
+        """Drop expired entries, then the oldest ones while over max_bytes."""
+        conn = self._conn()
+        conn.execute("DELETE FROM entries WHERE coalesce(stale_until, "
+                     "expires) <= ?", (time.time(),))
+        total, = conn.execute("SELECT total(size) FROM entries").fetchone()
+        while total > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM entries "
+                                "ORDER BY created LIMIT 64").fetchall()
+            if not rows:
+                break
+            conn.executemany("DELETE FROM entries WHERE key = ?",
+                             ((key,) for key, _ in rows))
+            total -= sum(size for _, size in rows)
+            with self._lock:
+                self.evictions += len(rows)
+
+    def invalidate_tables(self, tables):
+        """Bump the version of each of tables for every process."""
+        self._conn().executemany(
+            "INSERT INTO table_versions VALUES (?, 1) ON CONFLICT (name) "
+            "DO UPDATE SET version = version + 1",
+            ((table.lower(),) for table in tables))
+
+    def clear(self):
+        self.invalidate_tables([_ALL_TABLES])
+        self._conn().execute("DELETE FROM entries")
+
+    def stats(self):
+        entries, size = self._conn().execute(
+            "SELECT count(*), total(size) FROM entries").fetchone()
+        with self._lock:
+            return {
+                "entries": entries,
+                "bytes": int(size),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def close(self):
+        """Close the connections this cache opened (one per thread)."""
+        with self._lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+    def __len__(self):
+        return self._conn().execute(
+            "SELECT count(*) FROM entries").fetchone()[0]
+
+    def __contains__(self, key):
+        return self._conn().execute(
+            "SELECT 1 FROM entries WHERE key = ?",
+            (self._key(key),)).fetchone() is not None
+
+
+# Set QUERY_CACHE_PATH to share one on-disk cache between the processes
+# on a host; writers importing this module then invalidate it too
+if os.environ.get("QUERY_CACHE_PATH"):
+    default_cache = SqliteCache(os.environ["QUERY_CACHE_PATH"])
+else:
+    default_cache = QueryCache()
@@ -0,0 +1,335 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import quote
+
+# Handed to a waiter when a slot frees up without a connection to pass on
+_CREATE = object()
+
+# Compiled statements sqlite3 keeps per connection (its default is 128)
+CACHED_STATEMENTS = 256
+
+# Rows iter_rows() fetches per fetchmany() call
+FETCH_CHUNK = 500
+
+# Largest IN (...) list in_list_chunks() builds; shorter ones are padded
+# up to a power of two so only a handful of distinct statements compile
+MAX_IN_LIST = 512
+
+# PRAGMA sets applied to every new connection, picked per workload:
+# - default: sqlite's own settings (rollback journal, synchronous FULL)
+# - wal: readers and the writer don't block each other; NORMAL sync only
+#   fsyncs at checkpoints, so a power loss may drop the last commits
+# - durable: WAL, but every commit is fsynced
+# - bulk: fastest loads, no fsync at all; only for re-creatable data
+PROFILES = {
+    "default": {},
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -65536,      # KiB, i.e. 64 MiB
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        "cache_size": -65536,
+        "temp_store": "MEMORY",
+    },
+    "bulk": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "busy_timeout": 5000,
+        "cache_size": -262144,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+    },
+}
+DEFAULT_PROFILE = "wal"
+
+_PRAGMA_VALUE = re.compile(r"-?\w+")
+
+
+def iter_rows(cursor, chunk_size=FETCH_CHUNK):
+    """
+    Yield the rows of an executed cursor, fetching chunk_size at a time,
+    and close the cursor once exhausted or when the generator is closed.
+    """
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def in_list_chunks(values, max_size=MAX_IN_LIST):
+    """
+    Split values for `column IN (...)` queries: yields (placeholders,
+    params) per chunk of at most max_size values, padded to a power of
+    two by repeating the last value. Yields nothing for no values.
+    """
+    values = list(values)
+    for start in range(0, len(values), max_size):
+        chunk = values[start:start + max_size]
+        size = 1 << (len(chunk) - 1).bit_length()
+        chunk += chunk[-1:] * (size - len(chunk))
+        yield ", ".join("?" * size), chunk
+
+
+def profile_pragmas(profile=DEFAULT_PROFILE, read_only=False):
+    """PRAGMA statements for a PROFILES entry (or a dict of PRAGMAs)."""
+    pragmas = PROFILES[profile] if isinstance(profile, str) else profile
+    statements = []
+    for name, value in pragmas.items():
+        if read_only and name == "journal_mode":
+            continue  # persisted in the file; read-only can't change it
+        if not (name.isidentifier() and _PRAGMA_VALUE.fullmatch(str(value))):
+            raise ValueError(f"Invalid pragma: {name} = {value!r}")
+        statements.append(f"PRAGMA {name} = {value}")
+    return statements
+
+
+def apply_profile(conn, profile=DEFAULT_PROFILE, read_only=False):
+    """Apply a PROFILES entry (or a dict of PRAGMAs) to a connection."""
+    for statement in profile_pragmas(profile, read_only):
+        conn.execute(statement).fetchall()
+
+
+def read_only_uri(database):
+    """URI opening database read-only (pass uri=True to connect)."""
+    return f"file:{quote(os.path.abspath(database))}?mode=ro"
+
+
+def connect(database, cached_statements=CACHED_STATEMENTS,
+            profile=DEFAULT_PROFILE, read_only=False, **kwargs):
+    """
+    Open a sqlite3 connection for the pool with profile applied.
+    read_only connections open the file with mode=ro. check_same_thread is
+    off since the pool hands each connection to one thread at a time.
+    """
+    if read_only:
+        database, kwargs["uri"] = read_only_uri(database), True
+    conn = sqlite3.connect(database, check_same_thread=False,
+                           cached_statements=cached_statements,
+                           **kwargs)
+    try:
+        apply_profile(conn, profile, read_only)
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of sqlite3 connections to one database file.
+    - keeps between min_size and max_size connections; acquire() waits up
+      to timeout seconds for one when all are busy, then raises TimeoutError
+    - waiters are served first come, first served: a released connection
+      is handed straight to the longest waiting thread
+    - per-thread affinity: a thread gets back the connection it used last
+      whenever that one is idle
+    - connections idle longer than health_check_interval are checked with
+      SELECT 1 before reuse, and replaced if broken
+    - connections keep cached_statements compiled statements, so hot
+      queries skip re-parsing, and are set up with the given PROFILES
+      entry; read_only pools open the file with mode=ro
+    - stats() reports acquisitions, creations and wait-time metrics
+    """
+
+    def __init__(self, database, min_size=1, max_size=8, timeout=5.0,
+                 health_check_interval=30.0,
+                 cached_statements=CACHED_STATEMENTS,
+                 profile=DEFAULT_PROFILE, read_only=False):
+        self.database = database
+        self.cached_statements = cached_statements
+        self.profile = profile
+        self.read_only = read_only
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = []          # (connection, idle since), most recent last
+        self._waiters = deque()  # [event, handed-over connection] per waiter
+        self._size = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.acquired = 0
+        self.created = 0
+        self.replaced = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        for _ in range(min_size):
+            self._idle.append((self._create(), time.monotonic()))
+            self._size += 1
+
+    def _create(self):
+        conn = connect(self.database, self.cached_statements,
+                       self.profile, self.read_only)
+        with self._lock:
+            self.created += 1
+        return conn
+
+    def _take_idle(self):
+        """Pop this thread's last connection if idle, else the newest one."""
+        preferred = getattr(self._local, "conn", None)
+        for i, (conn, since) in enumerate(self._idle):
+            if conn is preferred:
+                return self._idle.pop(i)
+        return self._idle.pop() if self._idle else None
+
+    def _healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _wait(self, start):
+        """Queue up for a connection; called with the lock held."""
+        waiter = [threading.Event(), None]
+        self._waiters.append(waiter)
+        self._lock.release()
+        try:
+            waiter[0].wait(self.timeout - (time.monotonic() - start))
+        finally:
+            self._lock.acquire()
+        if waiter[1] is None:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            raise TimeoutError(f"No connection to {self.database} "
+                               f"available after {self.timeout}s")
+        return waiter[1]
+
+    def acquire(self):
+        """Take a connection from the pool (release() it when done)."""
+        start = time.monotonic()
+        waited = False
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            entry = self._take_idle()
+            if entry is None:
+                if self._size < self.max_size:
+                    self._size += 1
+                    entry = _CREATE
+                else:
+                    waited = True
+                    entry = self._wait(start)
+        try:
+            if entry is _CREATE:
+                conn = self._create()
+            else:
+                conn, since = entry
+                if (time.monotonic() - since > self.health_check_interval
+                        and not self._healthy(conn)):
+                    conn.close()
+                    conn = self._create()
+                    with self._lock:
+                        self.replaced += 1
+        except BaseException:
+            self._discard()
+            raise
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self.acquired += 1
+            if waited:
+                self.waits += 1
+                self.wait_time += elapsed
+                self.max_wait = max(self.max_wait, elapsed)
+        self._local.conn = conn
+        return conn
+
+    def _discard(self):
+        """Give up a slot, letting the next waiter open a connection."""
+        with self._lock:
+            if self._waiters and not self._closed:
+                waiter = self._waiters.popleft()
+                waiter[1] = _CREATE
+                waiter[0].set()
+            else:
+                self._size -= 1
+
+    def release(self, conn):
+        """Return a connection; an open transaction is rolled back."""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if self._closed:
+                conn.close()
+                self._size -= 1
+                return
+            entry = (conn, time.monotonic())
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter[1] = entry
+                waiter[0].set()
+            else:
+                self._idle.append(entry)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that acquires and releases a connection."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close idle connections; busy ones are closed when released."""
+        with self._lock:
+            self._closed = True
+            for conn, _ in self._idle:
+                conn.close()
+            self._size -= len(self._idle)
+            self._idle = []
+            while self._waiters:
+                self._waiters.popleft()[0].set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "waiting": len(self._waiters),
+                "acquired": self.acquired,
+                "created": self.created,
+                "replaced": self.replaced,
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+                "avg_wait": self.wait_time / self.waits if self.waits else 0.0,
+                "max_wait": self.max_wait,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database, read_only=False, **kwargs):
+    """
+    Process-wide pool for database (one for writers, one for read_only
+    readers), created on first use with kwargs.
+    """
+    with _pools_lock:
+        key = (database, read_only)
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(database, read_only=read_only,
+                                                **kwargs)
+        return pool
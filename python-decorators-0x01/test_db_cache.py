@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Unittests for db_cache: table-based invalidation of QueryCache and
+SqliteCache entries, and version tokens guarding against stale sets.
+"""
+
+import os
+import tempfile
+import unittest
+
+import db_cache
+from db_cache import MISSING, QueryCache, SqliteCache
+
+
+class TestQueryCache(unittest.TestCase):
+    """Tests for QueryCache invalidation."""
+
+    def setUp(self):
+        self.cache = QueryCache()
+
+    def test_invalidate_tables_drops_readers_only(self):
+        self.cache.set("users", [(1,)], tables={"users"})
+        self.cache.set("orders", [(2,)], tables={"orders"})
+        self.cache.invalidate_tables(["Users"])
+        self.assertIs(self.cache.get("users"), MISSING)
+        self.assertEqual(self.cache.get("orders"), [(2,)])
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+    def test_module_invalidate_reaches_every_cache(self):
+        other = QueryCache()
+        self.cache.set("users", [(1,)], tables={"users"})
+        other.set("users", [(1,)], tables={"users"})
+        db_cache.invalidate_tables({"users"})
+        self.assertIs(self.cache.get("users"), MISSING)
+        self.assertIs(other.get("users"), MISSING)
+
+    def test_set_after_invalidation_is_refused(self):
+        version = self.cache.version()
+        self.cache.invalidate_tables(["users"])
+        self.assertFalse(self.cache.set("users", [(1,)], tables={"users"},
+                                        version=version))
+        self.assertIs(self.cache.get("users"), MISSING)
+        self.assertTrue(self.cache.set("users", [(1,)], tables={"users"},
+                                       version=self.cache.version()))
+        self.assertEqual(self.cache.get("users"), [(1,)])
+
+
+class TestSqliteCache(unittest.TestCase):
+    """Tests for SqliteCache invalidation through table versions."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.db")
+        self.cache = SqliteCache(self.path)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_invalidate_tables_is_per_table(self):
+        self.cache.set("users", [(1, "a")], tables={"users"})
+        self.cache.set("orders", [(2, "b")], tables={"orders"})
+        self.cache.invalidate_tables(["users"])
+        self.assertIs(self.cache.get("users"), MISSING)
+        self.assertEqual(self.cache.get("orders"), [(2, "b")])
+
+    def test_invalidation_is_seen_by_other_instances(self):
+        other = SqliteCache(self.path)
+        try:
+            self.cache.set("users", [(1, "a")], tables={"users"})
+            self.assertEqual(other.get("users"), [(1, "a")])
+            other.invalidate_tables(["users"])
+            self.assertIs(self.cache.get("users"), MISSING)
+        finally:
+            other.close()
+
+    def test_set_with_old_version_never_hits(self):
+        version = self.cache.version()
+        self.cache.invalidate_tables(["users"])
+        self.cache.set("users", [(1, "a")], tables={"users"},
+                       version=version)
+        self.assertIs(self.cache.get("users"), MISSING)
+
+
+if __name__ == "__main__":
+    unittest.main()
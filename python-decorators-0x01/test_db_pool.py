@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Unittests for db_pool.ConnectionPool: acquire timeouts, first come,
+first served handoff to waiting threads and rollback on release.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from db_pool import ConnectionPool
+
+TIMEOUT = 5
+
+
+def wait_until(predicate):
+    deadline = time.monotonic() + TIMEOUT
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Tests for ConnectionPool."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "email TEXT)")
+        conn.execute("INSERT INTO users VALUES (1, 'a@x.com')")
+        conn.commit()
+        conn.close()
+        self.pool = ConnectionPool(self.path, max_size=1, timeout=0.05)
+
+    def tearDown(self):
+        self.pool.close()
+        self.tmp.cleanup()
+
+    def test_acquire_times_out_when_exhausted(self):
+        conn = self.pool.acquire()
+        with self.assertRaises(TimeoutError):
+            self.pool.acquire()
+        self.assertEqual(self.pool.stats()["waiting"], 0)
+        self.pool.release(conn)
+        self.pool.release(self.pool.acquire())
+
+    def test_waiters_are_served_in_arrival_order(self):
+        self.pool.timeout = TIMEOUT
+        held = self.pool.acquire()
+        order = []
+
+        def borrow(name):
+            conn = self.pool.acquire()
+            order.append(name)
+            self.pool.release(conn)
+
+        threads = []
+        for name in ("first", "second", "third"):
+            thread = threading.Thread(target=borrow, args=(name,))
+            thread.start()
+            threads.append(thread)
+            wait_until(lambda: self.pool.stats()["waiting"] == len(threads))
+        self.pool.release(held)
+        for thread in threads:
+            thread.join(TIMEOUT)
+        self.assertEqual(order, ["first", "second", "third"])
+        self.assertEqual(self.pool.stats()["created"], 1)
+
+    def test_release_rolls_back_open_transaction(self):
+        with self.pool.connection() as conn:
+            conn.execute("UPDATE users SET email = 'lost' WHERE id = 1")
+            self.assertTrue(conn.in_transaction)
+        with self.pool.connection() as conn:
+            self.assertFalse(conn.in_transaction)
+            email, = conn.execute(
+                "SELECT email FROM users WHERE id = 1").fetchone()
+        self.assertEqual(email, "a@x.com")
+
+    def test_closed_pool_refuses_acquire(self):
+        self.pool.close()
+        with self.assertRaises(RuntimeError):
+            self.pool.acquire()
+
+
+if __name__ == "__main__":
+    unittest.main()
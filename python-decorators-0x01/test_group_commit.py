@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Unittests for GroupCommitter in 2-transactional.py: per-operation error
+isolation and recovery when the writer thread dies.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+transactions = __import__('2-transactional')
+
+TIMEOUT = 5
+
+
+def set_email(conn, user_id, email):
+    conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user_id))
+
+
+def fail(conn):
+    conn.execute("UPDATE users SET email = 'lost' WHERE id = 1")
+    raise ValueError("operation failed")
+
+
+class TestGroupCommitter(unittest.TestCase):
+    """Tests for GroupCommitter."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "email TEXT)")
+        conn.executemany("INSERT INTO users VALUES (?, ?)",
+                         [(1, "a@x.com"), (2, "b@x.com")])
+        conn.commit()
+        conn.close()
+        self.committer = transactions.GroupCommitter(self.path)
+
+    def tearDown(self):
+        self.committer.close()
+        self.tmp.cleanup()
+
+    def emails(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return dict(conn.execute("SELECT id, email FROM users"))
+        finally:
+            conn.close()
+
+    def test_failing_operation_is_isolated(self):
+        futures = [self.committer.submit(set_email, 2, "new@x.com"),
+                   self.committer.submit(fail),
+                   self.committer.submit(set_email, 1, "one@x.com")]
+        self.assertIsNone(futures[0].result(TIMEOUT))
+        with self.assertRaises(ValueError):
+            futures[1].result(TIMEOUT)
+        self.assertIsNone(futures[2].result(TIMEOUT))
+        self.assertEqual(self.emails(), {1: "one@x.com", 2: "new@x.com"})
+
+    def test_unopenable_database_fails_callers(self):
+        committer = transactions.GroupCommitter(
+            os.path.join(self.tmp.name, "missing", "x.db"))
+        future = committer.submit(set_email, 1, "x@x.com")
+        with self.assertRaises(sqlite3.OperationalError):
+            future.result(TIMEOUT)
+        # The dead writer is replaced on the next submit
+        again = committer.submit(set_email, 1, "x@x.com")
+        with self.assertRaises(sqlite3.OperationalError):
+            again.result(TIMEOUT)
+        committer.close()
+
+    def test_base_exception_fails_batch_and_recovers(self):
+        def interrupt(conn):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.committer.submit(interrupt).result(TIMEOUT)
+        self.committer.submit(set_email, 1, "after@x.com").result(TIMEOUT)
+        self.assertEqual(self.emails()[1], "after@x.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,40 +1,53 @@
 #!/usr/bin/env python3
 """
 0-stream_users.py
-- stream_users(): generator that yields one user row (as dict) at a time
+- stream_users(prefetch): generator that yields one user row (as dict) at a time
 Requirements: only one loop inside the generator
 """
 
 from seed import connect_to_prodev
 import mysql.connector
 
-def stream_users():
+def stream_users(prefetch=100):
     """
     Generator: yields rows one by one.
-    Uses server-side cursor via buffered=False and fetchmany to avoid loading all rows.
-    Only one loop used here (while True).
+    Uses an unbuffered (server-side) cursor via buffered=False and reads
+    `prefetch` rows per fetchmany, so at most one chunk is held in memory.
+    Rows are only read off the socket when the consumer asks for more, so a
+    slow consumer makes the server wait instead of filling our memory.
+    If iteration is abandoned early (e.g. after islice, or close()) the
+    connection is shut down at once rather than drained to the end.
+    Only one loop used here (while rows).
     """
     conn = connect_to_prodev()
     if conn is None:
         return
 
-    # cursor with dictionary=True for dict rows
-    cursor = conn.cursor(dictionary=True)
+    # cursor with dictionary=True for dict rows, unbuffered for streaming
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    exhausted = False
     try:
         cursor.execute("SELECT user_id, name, email, age FROM user_data")
-        # fetchone in a while loop (single loop)
-        row = cursor.fetchone()
-        while row:
-            yield {
-                "user_id": row["user_id"],
-                "name": row["name"],
-                "email": row["email"],
-                "age": int(row["age"])
-            }
-            row = cursor.fetchone()
+        rows = cursor.fetchmany(prefetch)
+        while rows:
+            yield from (
+                {
+                    "user_id": row["user_id"],
+                    "name": row["name"],
+                    "email": row["email"],
+                    "age": int(row["age"])
+                } for row in rows
+            )
+            rows = cursor.fetchmany(prefetch)
+        exhausted = True
     finally:
-        cursor.close()
-        conn.close()
+        if exhausted:
+            cursor.close()
+            conn.close()
+        else:
+            # Closing the cursor would first read every remaining row of
+            # the unbuffered result; dropping the socket releases it now.
+            conn.shutdown()
 
 
 # If run directly, print first 5 rows
@@ -3,15 +3,38 @@
 1-batch_processing.py
 - stream_users_in_batches(batch_size): yields batches (list of dicts)
 - batch_processing(batch_size): yields or prints users over age 25
+- stream_user_columns(batch_size): yields columnar batches (dict of columns)
+- columnar_batch_processing(batch_size): yields column batches over age 25
+Both streams accept a columns/where/order_by spec (see seed.build_select)
+that is compiled into the SQL, so filtering happens inside MySQL.
 Max loops in code: <= 3 (we keep it simple)
 """
 
-from seed import connect_to_prodev
+from array import array
+from itertools import compress
 
-def stream_users_in_batches(batch_size=50):
+from seed import build_select, connect_to_prodev
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; the array module is the fallback
+    np = None
+
+COLUMNS = ("user_id", "name", "email", "age")
+
+
+def _to_user_dicts(rows):
+    """Build the per-row dicts yielded by stream_users_in_batches."""
+    return [dict(r, age=int(r["age"])) if "age" in r else dict(r)
+            for r in rows]
+
+
+def stream_users_in_batches(batch_size=50, columns=None, where=None,
+                            order_by=None):
     """
     Generator that yields lists of rows (batches).
-    Uses fetchmany to get batch_size rows per DB call.
+    Uses fetchmany to get batch_size rows per DB call; only rows matching
+    the where predicates are read from the server.
     """
     conn = connect_to_prodev()
     if conn is None:
@@ -19,21 +42,13 @@ def stream_users_in_batches(batch_size=50):
 
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT user_id, name, email, age FROM user_data")
+        cursor.execute(*build_select(columns, where, order_by))
         while True:
             rows = cursor.fetchmany(batch_size)
             if not rows:
                 break
             # convert ages to int for consistency
-            batch = [
-                {
-                    "user_id": r["user_id"],
-                    "name": r["name"],
-                    "email": r["email"],
-                    "age": int(r["age"])
-                } for r in rows
-            ]
-            yield batch
+            yield _to_user_dicts(rows)
     finally:
         cursor.close()
         conn.close()
@@ -42,10 +57,82 @@ def stream_users_in_batches(batch_size=50):
 def batch_processing(batch_size=50):
     """
     Process each batch and print users with age > 25.
-    This function uses the generator above.
+    This function uses the generator above; the age filter is pushed down
+    to MySQL (an index range scan on idx_user_data_age).
     """
-    for batch in stream_users_in_batches(batch_size):
+    for batch in stream_users_in_batches(batch_size,
+                                         where=[("age", ">", 25)]):
         # one loop here (for each user in batch) - allowed within total loop budget
         for user in batch:
-            if user["age"] > 25:
-                print(user)
+            print(user)
+
+
+def _int_column(values):
+    """Pack ages into a NumPy int32 array, or array('i') without NumPy."""
+    if np is not None:
+        return np.fromiter(map(int, values), dtype=np.int32,
+                           count=len(values))
+    return array('i', map(int, values))
+
+
+def to_columns(rows, columns=COLUMNS):
+    """
+    Turn a list of tuples holding the given columns into a columnar batch,
+    e.g. {"user_id": [...], "name": [...], "email": [...], "age": int array}.
+    """
+    values = zip(*rows) if rows else ((),) * len(columns)
+    return {
+        name: _int_column(col) if name == "age" else list(col)
+        for name, col in zip(columns, values)
+    }
+
+
+def age_mask(ages, threshold):
+    """Boolean mask of ages > threshold (vectorized when NumPy is present)."""
+    if np is not None:
+        return ages > threshold
+    return [age > threshold for age in ages]
+
+
+def filter_columns(columns, mask):
+    """Keep only the rows of a columnar batch where mask is true."""
+    if np is not None:
+        return {
+            name: col[mask] if isinstance(col, np.ndarray)
+            else list(compress(col, mask))
+            for name, col in columns.items()
+        }
+    return {
+        name: array(col.typecode, compress(col, mask))
+        if isinstance(col, array) else list(compress(col, mask))
+        for name, col in columns.items()
+    }
+
+
+def stream_user_columns(batch_size=1000, columns=None, where=None,
+                        order_by=None):
+    """
+    Generator that yields columnar batches of up to batch_size users.
+    Rows are fetched as tuples, so no per-row dict is ever built.
+    """
+    columns = tuple(columns or COLUMNS)
+    conn = connect_to_prodev()
+    if conn is None:
+        return
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(*build_select(columns, where, order_by))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield to_columns(rows, columns)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def columnar_batch_processing(batch_size=1000, min_age=25):
+    """Yield columnar batches holding only users with age > min_age."""
+    yield from stream_user_columns(batch_size, where=[("age", ">", min_age)])
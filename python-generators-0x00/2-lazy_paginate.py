@@ -1,23 +1,102 @@
 #!/usr/bin/python3
+import base64
+import json
 seed = __import__('seed')
 
 
-def paginate_users(page_size, offset):
-    """Fetch a page of users from the database."""
+def _fetch_page(sql, params, session=None):
+    """Run a page query on session, or on a one-off connection."""
+    if session is not None:
+        return session.query(sql, params)
     connection = seed.connect_to_prodev()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
+    cursor.execute(sql, params)
     rows = cursor.fetchall()
+    cursor.close()
     connection.close()
     return rows
 
 
-def lazy_paginate(page_size):
-    """Generator that lazily fetches pages of users."""
-    offset = 0
-    while True:  # only one loop
-        rows = paginate_users(page_size, offset)
-        if not rows:
-            break
-        yield rows
-        offset += page_size
+def paginate_users(page_size, offset, session=None):
+    """Fetch a page of users from the database."""
+    return _fetch_page("SELECT * FROM user_data LIMIT %s OFFSET %s",
+                       (page_size, offset), session)
+
+
+def lazy_paginate(page_size, session=None):
+    """
+    Generator that lazily fetches pages of users.
+    All pages share one connection: the given session, or one opened for
+    the duration of the walk.
+    """
+    owned = session is None
+    if owned:
+        session = seed.ProdevSession()
+    try:
+        offset = 0
+        while True:  # only one loop
+            rows = paginate_users(page_size, offset, session)
+            if not rows:
+                break
+            yield rows
+            offset += page_size
+    finally:
+        if owned:
+            session.close()
+
+
+def encode_cursor(last_user_id):
+    """Turn the last seen user_id into an opaque, URL-safe cursor token."""
+    payload = json.dumps({"after": last_user_id}).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(token):
+    """Return the user_id stored in a cursor token (None for no token)."""
+    if not token:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode()))["after"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid pagination cursor: {token!r}") from e
+
+
+def paginate_users_after(page_size, last_user_id=None, session=None):
+    """
+    Fetch the page of users that follows last_user_id (keyset/seek paging).
+    The primary key index is used to seek straight to the page, so the cost
+    does not grow with the page depth like OFFSET does.
+    """
+    if last_user_id is None:
+        return _fetch_page(
+            "SELECT * FROM user_data ORDER BY user_id LIMIT %s",
+            (page_size,), session
+        )
+    return _fetch_page(
+        "SELECT * FROM user_data WHERE user_id > %s "
+        "ORDER BY user_id LIMIT %s",
+        (last_user_id, page_size), session
+    )
+
+
+def keyset_paginate(page_size, cursor=None, session=None):
+    """
+    Generator that lazily fetches pages using keyset pagination.
+    Yields (rows, next_cursor); pass next_cursor back in to resume the walk
+    later from the following page. Pages share one connection like
+    lazy_paginate does.
+    """
+    owned = session is None
+    if owned:
+        session = seed.ProdevSession()
+    try:
+        last_user_id = decode_cursor(cursor)
+        while True:  # only one loop
+            rows = paginate_users_after(page_size, last_user_id, session)
+            if not rows:
+                break
+            last_user_id = rows[-1]["user_id"]
+            yield rows, encode_cursor(last_user_id)
+    finally:
+        if owned:
+            session.close()
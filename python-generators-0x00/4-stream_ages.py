@@ -1,6 +1,12 @@
 #!/usr/bin/python3
+import bisect
+import math
 seed = __import__('seed')
 
+# A pushdown that fails with one of these falls back to streaming;
+# ProdevSession.connect raises ConnectionError when MySQL is unreachable
+PUSHDOWN_ERRORS = (seed.Error, ConnectionError)
+
 
 def stream_user_ages():
     """Generator that yields one user age at a time."""
@@ -12,8 +18,20 @@ def stream_user_ages():
     connection.close()
 
 
-def calculate_average():
-    """Calculate average age using the generator."""
+def calculate_average(pushdown=True):
+    """
+    Calculate average age. By default MySQL computes it, so only one row
+    crosses the wire; pushdown=False (or a failed pushdown) averages the
+    generator instead.
+    """
+    if pushdown:
+        try:
+            with seed.ProdevSession() as session:
+                avg = session.query("SELECT AVG(age) FROM user_data",
+                                    dictionary=False)[0][0]
+            return float(avg) if avg is not None else 0
+        except PUSHDOWN_ERRORS as e:
+            print(f"Error: {e}; falling back to streaming average")
     total = 0
     count = 0
     for age in stream_user_ages():  # loop 2
@@ -24,6 +42,179 @@ def calculate_average():
     return total / count
 
 
+class PercentileSketch:
+    """
+    Mergeable percentile sketch in the style of a t-digest: values are
+    folded into at most ~compression weighted centroids, kept small near
+    the tails so extreme percentiles stay accurate.
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.centroids = []  # sorted [mean, weight] pairs
+        self.buffer = []
+        self.count = 0
+
+    def add(self, value):
+        self.buffer.append(float(value))
+        self.count += 1
+        if len(self.buffer) >= self.compression * 5:
+            self._compress()
+
+    def _compress(self):
+        if not self.buffer:
+            return
+        points = sorted(self.centroids + [[v, 1] for v in self.buffer])
+        self.buffer = []
+        merged = [points[0]]
+        seen = 0
+        for mean, weight in points[1:]:
+            last = merged[-1]
+            q = (seen + last[1] + weight / 2) / self.count
+            limit = 4 * self.count * q * (1 - q) / self.compression
+            if last[1] + weight <= max(limit, 1):
+                total = last[1] + weight
+                last[0] += (mean - last[0]) * weight / total
+                last[1] = total
+            else:
+                seen += last[1]
+                merged.append([mean, weight])
+        self.centroids = merged
+
+    def percentile(self, p):
+        """Approximate p-th percentile (0-100), or None if empty."""
+        self._compress()
+        if not self.centroids:
+            return None
+        target = p / 100 * self.count
+        seen = 0
+        previous = None
+        for mean, weight in self.centroids:
+            center = seen + weight / 2
+            if target <= center:
+                if previous is None:
+                    return mean
+                p_mean, p_center = previous
+                frac = (target - p_center) / (center - p_center)
+                return p_mean + (mean - p_mean) * frac
+            previous = (mean, center)
+            seen += weight
+        return self.centroids[-1][0]
+
+
+class AgeStats:
+    """
+    Single-pass accumulator for age aggregates: count, sum, min, max,
+    mean/variance (Welford), percentiles (PercentileSketch) and a
+    histogram of bucket_size-wide age buckets.
+    """
+
+    def __init__(self, bucket_size=10, compression=100):
+        self.bucket_size = bucket_size
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.histogram = {}
+        self.sketch = PercentileSketch(compression)
+
+    def add(self, age):
+        age = float(age)
+        self.count += 1
+        self.total += age
+        delta = age - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (age - self.mean)
+        self.min = age if self.min is None else min(self.min, age)
+        self.max = age if self.max is None else max(self.max, age)
+        bucket = int(age // self.bucket_size) * self.bucket_size
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+        self.sketch.add(age)
+
+    def result(self, percentiles=(50, 90, 99)):
+        """Aggregates as a dict (same shape as age_stats)."""
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.mean if self.count else None,
+            "variance": self.m2 / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "percentiles": {p: self.sketch.percentile(p)
+                            for p in percentiles},
+            "histogram": dict(sorted(self.histogram.items())),
+        }
+
+
+def _percentile_from_counts(values, cumulative, p):
+    """Exact p-th percentile (linear interpolation) from a value histogram."""
+    total = cumulative[-1]
+    rank = p / 100 * (total - 1)
+    low = values[bisect.bisect_right(cumulative, math.floor(rank))]
+    high = values[bisect.bisect_right(cumulative, math.ceil(rank))]
+    return low + (high - low) * (rank - math.floor(rank))
+
+
+def age_stats(percentiles=(50, 90, 99), bucket_size=10, ages=None):
+    """
+    Age aggregates: count, sum, mean, variance, min, max, percentiles and
+    a bucket_size histogram. With no ages given the work is pushed down to
+    MySQL: one aggregate query plus a GROUP BY age, so at most one row per
+    distinct age crosses the wire and percentiles are exact. Any other
+    iterable of ages (or a failed pushdown) goes through a single streaming
+    pass of AgeStats instead.
+    """
+    if ages is None:
+        try:
+            return _pushdown_age_stats(percentiles, bucket_size)
+        except PUSHDOWN_ERRORS as e:
+            print(f"Error: {e}; falling back to streaming aggregation")
+            ages = stream_user_ages()
+    stats = AgeStats(bucket_size)
+    for age in ages:
+        stats.add(age)
+    return stats.result(percentiles)
+
+
+def _pushdown_age_stats(percentiles, bucket_size):
+    with seed.ProdevSession() as session:
+        count, total, mean, low, high, variance = session.query(
+            "SELECT COUNT(age), SUM(age), AVG(age), MIN(age), MAX(age), "
+            "VAR_POP(age) FROM user_data", dictionary=False)[0]
+        counts = session.query(
+            "SELECT age, COUNT(*) FROM user_data GROUP BY age ORDER BY age",
+            dictionary=False)
+
+    values = [float(age) for age, _ in counts]
+    cumulative = []
+    histogram = {}
+    running = 0
+    for age, n in counts:
+        running += n
+        cumulative.append(running)
+        bucket = int(age // bucket_size) * bucket_size
+        histogram[bucket] = histogram.get(bucket, 0) + n
+
+    def as_float(value):
+        return float(value) if value is not None else None
+
+    return {
+        "count": count,
+        "sum": as_float(total) or 0.0,
+        "mean": as_float(mean),
+        "variance": as_float(variance),
+        "min": as_float(low),
+        "max": as_float(high),
+        "percentiles": {
+            p: _percentile_from_counts(values, cumulative, p) if count
+            else None for p in percentiles
+        },
+        "histogram": histogram,
+    }
+
+
 if __name__ == "__main__":
     avg_age = calculate_average()
     print(f"Average age of users: {avg_age}")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+5-partitioned_scan.py
+- key_ranges(partitions): splits the user_id key space into ranges
+- partitioned_scan(workers, ...): reads the ranges of user_data concurrently
+  from a process pool, each worker with its own connection, and yields
+  rows (as dicts) either in user_id order or as soon as a range is done
+"""
+
+import os
+import time
+from multiprocessing import Pool
+
+from seed import build_select, connect_to_prodev
+
+# Per-process connection, opened by the pool initializer
+_connection = None
+
+
+def _init_worker():
+    global _connection
+    _connection = connect_to_prodev()
+
+
+def key_ranges(partitions):
+    """
+    Split the user_id key space into `partitions` [low, high) ranges, with
+    None for an open end. user_ids are uuids, so splitting on their leading
+    hex digits spreads rows evenly across the ranges.
+    """
+    bounds = [format(i * 0x10000 // partitions, "04x")
+              for i in range(1, partitions)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def _scan_range(task):
+    """Worker: read every row of one key range, ordered by user_id."""
+    low, high, columns, where = task
+    predicates = list(where or [])
+    if low is not None:
+        predicates.append(("user_id", ">=", low))
+    if high is not None:
+        predicates.append(("user_id", "<", high))
+    cursor = _connection.cursor(dictionary=True)
+    try:
+        cursor.execute(*build_select(columns, predicates, ["user_id"]))
+        return [dict(r, age=int(r["age"])) if "age" in r else r
+                for r in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def partitioned_scan(workers=None, partitions=None, ordered=False,
+                     columns=None, where=None):
+    """
+    Generator over user_data rows read by `workers` processes in parallel
+    (default: one per core). The table is cut into `partitions` key ranges
+    (default: 8 per worker, so a slow range does not stall the others).
+    With ordered=True rows come out in user_id order; otherwise each range
+    is yielded as soon as it is read. columns/where are as for
+    seed.build_select.
+    """
+    workers = workers or os.cpu_count() or 1
+    partitions = partitions or workers * 8
+    tasks = [(low, high, columns, where)
+             for low, high in key_ranges(partitions)]
+    with Pool(workers, initializer=_init_worker) as pool:
+        scan = pool.imap if ordered else pool.imap_unordered
+        for rows in scan(_scan_range, tasks):
+            yield from rows
+
+
+if __name__ == "__main__":
+    for n in sorted({1, 2, 4, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        count = sum(1 for _ in partitioned_scan(workers=n))
+        elapsed = time.perf_counter() - start
+        print(f"workers={n}: {count} rows in {elapsed:.2f}s "
+              f"({count / elapsed:,.0f} rows/sec)")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+6-async_streams.py
+- async generator versions of the user streams, on aiomysql:
+  async_stream_users, async_stream_users_in_batches, async_lazy_paginate
+  and async_stream_user_ages (same row shapes as the blocking versions)
+- create_pool(): shared aiomysql connection pool for those streams
+Wrap a stream in contextlib.aclosing() when breaking out of it early, so
+its connection goes back to the pool right away.
+"""
+
+import aiomysql
+
+import seed
+
+
+async def create_pool(minsize=1, maxsize=10):
+    """Create an aiomysql pool on ALX_prodev."""
+    return await aiomysql.create_pool(
+        **seed.DB_CONFIG, db=seed.DB_NAME,
+        minsize=minsize, maxsize=maxsize, autocommit=True
+    )
+
+
+async def _stream_chunks(pool, sql, params=None, size=100):
+    """
+    Async generator over chunks of dict rows from an unbuffered (SSDictCursor)
+    query, holding one pooled connection until done. If abandoned early the
+    connection is closed rather than drained.
+    """
+    async with pool.acquire() as conn:
+        cursor = await conn.cursor(aiomysql.SSDictCursor)
+        exhausted = False
+        try:
+            await cursor.execute(sql, params)
+            rows = await cursor.fetchmany(size)
+            while rows:
+                yield rows
+                rows = await cursor.fetchmany(size)
+            exhausted = True
+        finally:
+            if exhausted:
+                await cursor.close()
+            else:
+                # Closing an unbuffered cursor reads the rest of the result;
+                # drop the connection instead, the pool replaces it.
+                conn.close()
+
+
+def _user(row):
+    return {
+        "user_id": row["user_id"],
+        "name": row["name"],
+        "email": row["email"],
+        "age": int(row["age"])
+    }
+
+
+async def async_stream_users(pool, prefetch=100):
+    """Async generator that yields one user row (as dict) at a time."""
+    async for rows in _stream_chunks(
+            pool, "SELECT user_id, name, email, age FROM user_data",
+            size=prefetch):
+        for row in rows:
+            yield _user(row)
+
+
+async def async_stream_users_in_batches(pool, batch_size=50):
+    """Async generator that yields lists of user dicts (batches)."""
+    async for rows in _stream_chunks(
+            pool, "SELECT user_id, name, email, age FROM user_data",
+            size=batch_size):
+        yield [_user(row) for row in rows]
+
+
+async def async_lazy_paginate(pool, page_size):
+    """
+    Async generator that lazily fetches pages of users, seeking past the
+    last user_id of each page (keyset pagination) on a pooled connection.
+    """
+    last_user_id = None
+    while True:
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                if last_user_id is None:
+                    await cursor.execute(
+                        "SELECT * FROM user_data ORDER BY user_id LIMIT %s",
+                        (page_size,))
+                else:
+                    await cursor.execute(
+                        "SELECT * FROM user_data WHERE user_id > %s "
+                        "ORDER BY user_id LIMIT %s",
+                        (last_user_id, page_size))
+                rows = await cursor.fetchall()
+        if not rows:
+            break
+        yield rows
+        last_user_id = rows[-1]["user_id"]
+
+
+async def async_stream_user_ages(pool, prefetch=500):
+    """Async generator that yields one user age at a time."""
+    async for rows in _stream_chunks(pool, "SELECT age FROM user_data",
+                                     size=prefetch):
+        for row in rows:
+            yield row["age"]
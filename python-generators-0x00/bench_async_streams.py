@@ -0,0 +1,42 @@
+#!/usr/bin/python3
+"""
+bench_async_streams.py
+- Runs N concurrent async_stream_users consumers on one event loop,
+  sharing one aiomysql pool, and reports wall time and total rows/sec
+  as N grows.
+Usage: ./bench_async_streams.py [max_streams] [pool_size]
+"""
+import asyncio
+import sys
+import time
+
+streams = __import__('6-async_streams')
+
+
+async def consume(pool):
+    count = 0
+    async for _ in streams.async_stream_users(pool):
+        count += 1
+    return count
+
+
+async def main(max_streams=64, pool_size=16):
+    pool = await streams.create_pool(maxsize=pool_size)
+    try:
+        print(f"pool_size={pool_size}")
+        print(f"{'streams':>8} {'rows':>10} {'seconds':>8} {'rows/sec':>12}")
+        n = 1
+        while n <= max_streams:
+            start = time.perf_counter()
+            counts = await asyncio.gather(*(consume(pool) for _ in range(n)))
+            elapsed = time.perf_counter() - start
+            rows = sum(counts)
+            print(f"{n:>8} {rows:>10} {elapsed:>8.2f} {rows / elapsed:>12,.0f}")
+            n *= 4
+    finally:
+        pool.close()
+        await pool.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*[int(a) for a in sys.argv[1:3]]))
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+"""
+bench_batches.py
+- Compares the dict batches of stream_users_in_batches + a Python filter
+  against columnar batches + a vectorized age mask, on synthetic rows
+  shaped like the connector's output (so no database is needed).
+- Reports rows/sec and the tracemalloc peak per batch.
+Usage: ./bench_batches.py [rows] [batch_size]
+       (set BENCH_DB=1 to also time both modes against MySQL)
+"""
+import os
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+processing = __import__('1-batch_processing')
+
+
+def make_rows(count):
+    """Tuple rows as a plain cursor returns them (age is DECIMAL)."""
+    return [(f"id-{i:08d}", f"User {i}", f"user{i}@example.com",
+             Decimal(i % 100)) for i in range(count)]
+
+
+def dict_mode(batch):
+    users = processing._to_user_dicts(batch)
+    return [user for user in users if user["age"] > 25]
+
+
+def columnar_mode(batch):
+    columns = processing.to_columns(batch)
+    return processing.filter_columns(
+        columns, processing.age_mask(columns["age"], 25))
+
+
+def run(mode, batches):
+    """Return (rows/sec, peak KiB per batch) of mode over batches."""
+    rows = sum(len(b) for b in batches)
+    start = time.perf_counter()
+    for batch in batches:
+        mode(batch)
+    rate = rows / (time.perf_counter() - start)
+    tracemalloc.start()
+    mode(batches[0])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rate, peak / 1024
+
+
+def run_db(stream, batch_size):
+    start = time.perf_counter()
+    rows = sum(len(b["age"]) if isinstance(b, dict) else len(b)
+               for b in stream(batch_size))
+    return rows / (time.perf_counter() - start)
+
+
+def main(rows=200000, batch_size=1000):
+    tuples = make_rows(rows)
+    dict_batches = [
+        [dict(zip(processing.COLUMNS, r)) for r in tuples[i:i + batch_size]]
+        for i in range(0, rows, batch_size)
+    ]
+    tuple_batches = [tuples[i:i + batch_size]
+                     for i in range(0, rows, batch_size)]
+    backend = "numpy" if processing.np is not None else "array"
+    print(f"rows={rows} batch_size={batch_size} columnar backend={backend}")
+    print(f"{'mode':>9} {'rows/sec':>12} {'peak KiB/batch':>15}")
+    for name, mode, batches in (("dict", dict_mode, dict_batches),
+                                ("columnar", columnar_mode, tuple_batches)):
+        rate, peak = run(mode, batches)
+        print(f"{name:>9} {rate:>12,.0f} {peak:>15.1f}")
+    if os.environ.get("BENCH_DB"):
+        for name, stream in (("dict", processing.stream_users_in_batches),
+                             ("columnar", processing.stream_user_columns)):
+            rate = run_db(stream, batch_size)
+            print(f"{name:>9} {rate:>12,.0f} {'(mysql)':>15}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
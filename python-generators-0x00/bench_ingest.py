@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+"""
+bench_ingest.py
+- Measures peak Python memory (tracemalloc) and throughput of parsing and
+  validating a generated user CSV with csv.DictReader row by row against
+  seed.read_user_blocks, and of the full bulk_insert_data pipeline into a
+  discarding writer.
+- Runs at two file sizes to show that the block pipeline stays flat.
+  DictReader holds one row at a time and so always peaks lowest; the
+  block path trades ~1-2 MiB (queue_size blocks of BLOCK_SIZE bytes) for
+  batched rows that feed executemany directly.
+Usage: ./bench_ingest.py [rows]   (set BENCH_DB=1 to also load into MySQL)
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+seed = __import__('seed')
+
+
+class _DiscardCursor:
+    def executemany(self, sql, rows):
+        pass
+
+    def close(self):
+        pass
+
+
+class _DiscardConnection:
+    """Stands in for MySQL so only the parse/validate pipeline is timed."""
+
+    def cursor(self):
+        return _DiscardCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def write_csv(path, rows):
+    """Write a synthetic user CSV with the given number of rows."""
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        writer.writerow(["name", "email", "age"])
+        for i in range(rows):
+            writer.writerow([f"User {i}", f"user{i}@example.com", i % 100])
+
+
+def dictreader_pass(path):
+    """Row-at-a-time baseline doing the same checks as validate_users."""
+    match = seed.EMAIL_RE.fullmatch
+    valid = 0
+    with open(path, newline='') as file:
+        for row in csv.DictReader(file):
+            age, email = row["age"], row["email"]
+            if age.strip().isdigit() and int(age) <= seed.MAX_AGE \
+                    and match(email):
+                seed.user_id_for(email)
+                valid += 1
+    return valid
+
+
+def blocks_pass(path):
+    for block in seed.read_user_blocks(path):
+        seed.validate_users(block)
+
+
+def pipeline_pass(path):
+    seed.bulk_insert_data(_DiscardConnection(), path)
+
+
+def measure(func, path):
+    """
+    Return (seconds, peak MiB) for func(path). Time and memory come from
+    separate runs, since tracemalloc slows allocation-heavy code down.
+    """
+    start = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / (1 << 20)
+
+
+def main(rows=200000):
+    runs = [("dictreader", dictreader_pass), ("blocks", blocks_pass),
+            ("pipeline", pipeline_pass)]
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'rows':>9} {'mode':>11} {'rows/sec':>11} {'peak MiB':>9}")
+        for size in (rows, rows * 4):
+            path = os.path.join(tmp, f"users_{size}.csv")
+            write_csv(path, size)
+            for name, func in runs:
+                elapsed, peak = measure(func, path)
+                print(f"{size:>9} {name:>11} {size / elapsed:>11,.0f} "
+                      f"{peak:>9.2f}")
+            if os.environ.get("BENCH_DB"):
+                connection = seed.connect_to_prodev()
+                elapsed, peak = measure(
+                    lambda p: seed.bulk_insert_data(connection, p), path)
+                connection.close()
+                print(f"{size:>9} {'mysql':>11} {size / elapsed:>11,.0f} "
+                      f"{peak:>9.2f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+"""
+bench_lazy_paginate.py
+- Compares page latency of OFFSET paging against keyset paging at
+  increasing depths of the user_data table. Both run on one shared
+  ProdevSession, so the timings are query time only, not connect time.
+Usage: ./bench_lazy_paginate.py [page_size] [repeats]
+"""
+import sys
+import time
+
+seed = __import__('seed')
+paginator = __import__('2-lazy_paginate')
+
+
+def user_id_at(depth):
+    """Return the user_id just before position depth (None at the start)."""
+    if depth == 0:
+        return None
+    connection = seed.connect_to_prodev()
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT user_id FROM user_data ORDER BY user_id LIMIT 1 OFFSET %s",
+        (depth - 1,)
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    connection.close()
+    return row[0] if row else None
+
+
+def time_call(func, *args, repeats=5, **kwargs):
+    """Best-of-N wall time of func(*args, **kwargs) in milliseconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(page_size=100, repeats=5):
+    connection = seed.connect_to_prodev()
+    cursor = connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM user_data")
+    total = cursor.fetchone()[0]
+    cursor.close()
+    connection.close()
+
+    depths = [0]
+    depth = page_size
+    while depth < total:
+        depths.append(depth)
+        depth *= 4
+
+    print(f"rows={total} page_size={page_size} repeats={repeats}")
+    print(f"{'depth':>10} {'offset ms':>10} {'keyset ms':>10}")
+    with seed.ProdevSession() as session:
+        session.connect()
+        for depth in depths:
+            offset_ms = time_call(paginator.paginate_users, page_size, depth,
+                                  repeats=repeats, session=session)
+            keyset_ms = time_call(paginator.paginate_users_after, page_size,
+                                  user_id_at(depth), repeats=repeats,
+                                  session=session)
+            print(f"{depth:>10} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+
+    with seed.ProdevSession() as session:
+        pages = sum(1 for _ in paginator.keyset_paginate(page_size,
+                                                         session=session))
+        stats = session.stats()
+    print(f"keyset walk: pages={pages} connects={stats['connects']} "
+          f"connect={stats['connect_time'] * 1000:.2f}ms "
+          f"query={stats['query_time'] * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -2,17 +2,43 @@
 import mysql.connector
 from mysql.connector import Error
 import csv
+import hashlib
 import uuid
 import os
+import queue
+import re
+import tempfile
+import threading
+import time
+
+DB_CONFIG = {"host": "localhost", "user": "root", "password": "root"}
+DB_NAME = "ALX_prodev"
+
+# Namespace for deterministic user ids: the same email always maps to the
+# same user_id, so seeding a file twice updates rows instead of duplicating.
+USER_ID_NAMESPACE = uuid.UUID("8a7c3e1e-2f4b-4d0a-9c61-5b0f2e9d4a17")
+
+UPSERT_USER_SQL = (
+    "INSERT INTO user_data (user_id, name, email, age) "
+    "VALUES (%s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE name = VALUES(name), email = VALUES(email), "
+    "age = VALUES(age)"
+)
+
+USER_COLUMNS = ("user_id", "name", "email", "age")
+OPERATORS = ("=", "!=", "<", "<=", ">", ">=", "LIKE", "IN")
+
+EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+MAX_AGE = 150
+
+# Bytes read per CSV block: ~1,300 rows, about one executemany batch, so a
+# block's row and tuple lists stay small and the loader runs in ~2 MiB.
+BLOCK_SIZE = 1 << 16
 
 def connect_db():
     """Connect to MySQL server (no database selected yet)."""
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="root"
-        )
+        connection = mysql.connector.connect(**DB_CONFIG)
         return connection
     except Error as e:
         print(f"Error: {e}")
@@ -26,14 +52,13 @@ def create_database(connection):
     cursor.close()
 
 
-def connect_to_prodev():
+def connect_to_prodev(allow_local_infile=False):
     """Connect to the ALX_prodev database."""
     try:
         connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="root",
-            database="ALX_prodev"
+            **DB_CONFIG,
+            database=DB_NAME,
+            allow_local_infile=allow_local_infile
         )
         return connection
     except Error as e:
@@ -42,31 +67,340 @@ def connect_to_prodev():
 
 
 def create_table(connection):
-    """Create table user_data if not exists."""
+    """Create table user_data (and its age index) if not exists."""
     cursor = connection.cursor()
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS user_data (
             user_id VARCHAR(255) PRIMARY KEY,
             name VARCHAR(255) NOT NULL,
             email VARCHAR(255) NOT NULL,
-            age DECIMAL NOT NULL
+            age DECIMAL NOT NULL,
+            INDEX idx_user_data_age (age)
         );
     """)
+    # Tables created before the index existed need it added separately
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'user_data'
+          AND index_name = 'idx_user_data_age'
+    """)
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("CREATE INDEX idx_user_data_age ON user_data (age)")
     connection.commit()
     print("Table user_data created successfully")
     cursor.close()
 
 
+def build_select(columns=None, where=None, order_by=None, limit=None):
+    """
+    Compile a small filter/projection spec into (sql, params) on user_data.
+    - columns: column names to select (default: all user columns)
+    - where: list of (column, operator, value) predicates, ANDed together;
+      operators are =, !=, <, <=, >, >=, LIKE and IN (value is a sequence)
+    - order_by: column names, prefixed with '-' for descending order
+    - limit: maximum number of rows
+    Values are always bound as parameters; unknown columns or operators
+    raise ValueError.
+    """
+    columns = list(columns or USER_COLUMNS)
+    for column in columns:
+        _check_column(column)
+    sql = f"SELECT {', '.join(columns)} FROM user_data"
+    params = []
+    clauses = []
+    for column, op, value in where or ():
+        _check_column(column)
+        op = op.upper()
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        if op == "IN":
+            value = list(value)
+            if not value:
+                clauses.append("FALSE")
+                continue
+            clauses.append(f"{column} IN ({', '.join(['%s'] * len(value))})")
+            params.extend(value)
+        else:
+            clauses.append(f"{column} {op} %s")
+            params.append(value)
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if order_by:
+        terms = []
+        for term in order_by:
+            column = term.lstrip("-")
+            _check_column(column)
+            terms.append(f"{column} DESC" if term.startswith("-") else column)
+        sql += " ORDER BY " + ", ".join(terms)
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(int(limit))
+    return sql, tuple(params)
+
+
+def _check_column(column):
+    if column not in USER_COLUMNS:
+        raise ValueError(f"Unknown user_data column: {column}")
+
+
 def insert_data(connection, csvfile):
     """Insert CSV data into user_data table if not already exists."""
+    return bulk_insert_data(connection, csvfile)
+
+
+def user_id_for(email):
+    """
+    Deterministic user_id for an email address, case- and
+    whitespace-insensitive: the value of
+    str(uuid.uuid5(USER_ID_NAMESPACE, email.strip().lower())), built
+    without the UUID object overhead since this runs once per seeded row.
+    """
+    name = email.strip().lower().encode()
+    b = bytearray(hashlib.sha1(USER_ID_NAMESPACE.bytes + name).digest()[:16])
+    b[6] = b[6] & 0x0F | 0x50
+    b[8] = b[8] & 0x3F | 0x80
+    h = b.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def read_user_blocks(csvfile, block_size=BLOCK_SIZE):
+    """
+    Generator that reads a user CSV block_size bytes at a time and yields
+    each block as a list of (name, email, age) tuples. Only one block (plus
+    a partial trailing line) is held in memory at a time, whatever the file
+    size. Quoted fields spanning several lines are not supported. Rows
+    with too few fields come through with empty fields, so validate_users
+    rejects (and counts) them.
+    """
+    with open(csvfile, 'rb') as file:
+        columns = None
+        tail = b""
+        while True:
+            block = file.read(block_size)
+            data = tail + block
+            cut = len(data) if not block else data.rfind(b"\n") + 1
+            tail = data[cut:]
+            rows = list(csv.reader(data[:cut].decode().splitlines()))
+            if columns is None and rows:
+                header = rows.pop(0)
+                columns = [header.index(c) for c in ("name", "email", "age")]
+            if rows:
+                name_i, email_i, age_i = columns
+                width = max(columns) + 1
+                yield [(r[name_i], r[email_i], r[age_i])
+                       if len(r) >= width else ("", "", "")
+                       for r in rows if r]
+            if not block:
+                break
+
+
+def validate_users(rows):
+    """
+    Validate a block of (name, email, age) tuples in one pass.
+    Returns (valid, rejected): valid rows as (user_id, name, email, age)
+    tuples ready for insertion, and the number of rows dropped.
+    """
+    match = EMAIL_RE.fullmatch
+    valid = [
+        (user_id_for(email), name, email, int(age))
+        for name, email, age in rows
+        if age.strip().isdigit() and int(age) <= MAX_AGE and match(email)
+    ]
+    return valid, len(rows) - len(valid)
+
+
+def read_user_rows(csvfile, block_size=BLOCK_SIZE):
+    """Yield validated (user_id, name, email, age) tuples from a user CSV."""
+    for block in read_user_blocks(csvfile, block_size):
+        yield from validate_users(block)[0]
+
+
+def print_progress(rows, elapsed):
+    """Default progress reporter for bulk_insert_data."""
+    rate = rows / elapsed if elapsed else 0.0
+    print(f"{rows} rows loaded in {elapsed:.1f}s ({rate:,.0f} rows/sec)")
+
+
+def _put(out, item, stop):
+    """Put item on a bounded queue, giving up once stop is set."""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce_user_blocks(csvfile, block_size, out, stop):
+    """Reader thread: parse and validate blocks into the bounded queue."""
+    try:
+        for block in read_user_blocks(csvfile, block_size):
+            if not _put(out, validate_users(block), stop):
+                return
+        _put(out, None, stop)
+    except Exception as e:
+        _put(out, e, stop)
+
+
+def bulk_insert_data(connection, csvfile, chunk_size=1000,
+                     commit_every=10000, use_load_data=False, progress=None,
+                     block_size=BLOCK_SIZE, queue_size=2):
+    """
+    Load a user CSV into user_data in bulk and return the row count.
+    A reader thread parses and validates the file in block_size chunks and
+    hands them to this (writer) thread through a queue of queue_size
+    blocks, so memory stays bounded for files of any size. Rows are sent
+    in executemany batches of chunk_size and committed every commit_every
+    rows, calling progress(rows, elapsed) after each commit.
+    With use_load_data=True the file goes through LOAD DATA LOCAL INFILE
+    instead (the connection must allow local infile). Re-running is safe:
+    user ids derive from the email, and existing rows are updated.
+    """
+    if use_load_data:
+        return _load_data_infile(connection, csvfile, progress)
+
+    start = time.perf_counter()
+    blocks = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    reader = threading.Thread(target=_produce_user_blocks,
+                              args=(csvfile, block_size, blocks, stop),
+                              daemon=True)
+    reader.start()
     cursor = connection.cursor()
-    with open(csvfile, 'r') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            user_id = str(uuid.uuid4())
-            cursor.execute(
-                "INSERT INTO user_data (user_id, name, email, age) VALUES (%s, %s, %s, %s)",
-                (user_id, row['name'], row['email'], row['age'])
-            )
-    connection.commit()
-    cursor.close()
+    total = committed = rejected = 0
+    try:
+        while True:
+            item = blocks.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            rows, dropped = item
+            rejected += dropped
+            for i in range(0, len(rows), chunk_size):
+                chunk = rows[i:i + chunk_size]
+                cursor.executemany(UPSERT_USER_SQL, chunk)
+                total += len(chunk)
+                if total - committed >= commit_every:
+                    connection.commit()
+                    committed = total
+                    if progress:
+                        progress(total, time.perf_counter() - start)
+        connection.commit()
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        stop.set()
+        reader.join()
+        cursor.close()
+    if progress and total != committed:
+        progress(total, time.perf_counter() - start)
+    if rejected:
+        print(f"Skipped {rejected} invalid rows")
+    return total
+
+
+def _load_data_infile(connection, csvfile, progress=None):
+    """LOAD DATA fast path: write ids into a temp CSV and load it at once."""
+    start = time.perf_counter()
+    total = 0
+    with tempfile.NamedTemporaryFile('w', newline='', suffix='.csv',
+                                     delete=False) as tmp:
+        writer = csv.writer(tmp)
+        for row in read_user_rows(csvfile):
+            writer.writerow(row)
+            total += 1
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE user_data "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            "LINES TERMINATED BY '\\r\\n' (user_id, name, email, age)",
+            (tmp.name,)
+        )
+        connection.commit()
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+        os.remove(tmp.name)
+    if progress:
+        progress(total, time.perf_counter() - start)
+    return total
+
+
+class ProdevSession:
+    """
+    Keeps one ALX_prodev connection open across many queries.
+    A dropped connection is reopened and the query retried once. Connect
+    and query time are tracked separately so they can be reported.
+    """
+
+    def __init__(self):
+        self.connection = None
+        self.connects = 0
+        self.queries = 0
+        self.connect_time = 0.0
+        self.query_time = 0.0
+
+    def connect(self):
+        """Open (or reopen) the underlying connection."""
+        self.close()
+        start = time.perf_counter()
+        self.connection = connect_to_prodev()
+        self.connect_time += time.perf_counter() - start
+        if self.connection is None:
+            raise ConnectionError("Could not connect to ALX_prodev")
+        self.connects += 1
+        return self.connection
+
+    def query(self, sql, params=None, dictionary=True):
+        """Run sql and return all rows, reconnecting once if dropped."""
+        for attempt in range(2):
+            if self.connection is None:
+                self.connect()
+            start = time.perf_counter()
+            try:
+                cursor = self.connection.cursor(dictionary=dictionary)
+                try:
+                    cursor.execute(sql, params)
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+            except (mysql.connector.errors.OperationalError,
+                    mysql.connector.errors.InterfaceError):
+                self.close()
+                if attempt:
+                    raise
+                continue
+            finally:
+                self.query_time += time.perf_counter() - start
+            self.queries += 1
+            return rows
+
+    def stats(self):
+        """Connect/query counters and timings (seconds)."""
+        return {
+            "connects": self.connects,
+            "connect_time": self.connect_time,
+            "queries": self.queries,
+            "query_time": self.query_time,
+        }
+
+    def close(self):
+        """Close the connection if one is open."""
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Error:
+                pass
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()